@@ -3,10 +3,20 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+import json
 import logging
-from typing import TYPE_CHECKING
+from pathlib import Path
+import re
+import sqlite3
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
 
-from aioimaplib import IMAP4_SSL, IMAP4, AioImapException, Response
+from aioimaplib import IMAP4_SSL, IMAP4, AioImapException, Command, Response
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
@@ -21,22 +31,52 @@ from homeassistant.core import (
 from homeassistant.exceptions import (
     ConfigEntryAuthFailed,
     ConfigEntryError,
-    ConfigEntryNotReady,
     ServiceValidationError,
 )
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 from homeassistant.helpers.typing import ConfigType
+from homeassistant.util import dt as dt_util
 from homeassistant.util.ssl import SSLCipherList
 
-from .const import CONF_ENABLE_PUSH, DOMAIN
+from .const import (
+    CONF_CHARSET,
+    CONF_ENABLE_PUSH,
+    CONF_FOLDER,
+    DOMAIN,
+    HEADER_NAME_RE,
+)
 from .coordinator import (
+    STORAGE_VERSION,
     ImapMessage,
-    ImapParts,
     ImapPollingDataUpdateCoordinator,
     ImapPushDataUpdateCoordinator,
     connect_to_server,
+    fetch_item,
+    find_fetched_message,
+    find_text_part,
+    get_selected_uidvalidity,
+    iter_body_parts,
+    parse_bodystructure,
+    parse_envelope,
+    parse_fetch_response,
 )
 from .errors import InvalidAuth, InvalidFolder
+from .pipeline import ImapPipeline
+from .scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    SchedulerQueueTimeout,
+)
+from .export import (
+    EXPORT_FORMAT_MBOX,
+    EXPORT_FORMATS,
+    create_writer,
+    iter_batches,
+    load_checkpoint,
+    parse_internaldate,
+    write_batch,
+)
 from .const import (
     CONF_SSL_CIPHER_LIST,
     CONF_USE_SSL,
@@ -54,6 +94,52 @@ CONF_UNTAG = "untag"
 CONF_TARGET_FOLDER = "target_folder"
 CONF_ATTACHMENT = "attachment"
 CONF_ATTACHMENT_FILTER = "attachment_filter"
+CONF_UIDS = "uids"
+CONF_CONCURRENCY = "concurrency"
+CONF_CRITERIA = "criteria"
+CONF_SORT = "sort"
+CONF_PAGE_SIZE = "page_size"
+CONF_CURSOR = "cursor"
+CONF_PATH = "path"
+CONF_FORMAT = "format"
+CONF_BATCH_SIZE = "batch_size"
+CONF_SENDER = "sender"
+CONF_SUBJECT = "subject"
+CONF_FLAGGED = "flagged"
+CONF_SINCE = "since"
+CONF_LIMIT = "limit"
+CONF_PAYLOAD_KEY = "payload_key"
+CONF_TRACING = "tracing"
+CONF_PROFILING = "profiling"
+CONF_MODE = "mode"
+CONF_HEADERS = "headers"
+
+FETCH_MODE_ATTACHMENTS = "attachments"
+FETCH_MODE_TEXT = "text"
+FETCH_MODE_STRUCTURE = "structure"
+FETCH_MODE_HEADERS = "headers"
+FETCH_MODES = [
+    FETCH_MODE_ATTACHMENTS,
+    FETCH_MODE_TEXT,
+    FETCH_MODE_STRUCTURE,
+    FETCH_MODE_HEADERS,
+]
+
+FETCH_MANY_CHUNK_SIZE = 25
+MAX_FETCH_MANY_MESSAGES = 500
+MAX_FETCH_MANY_CONCURRENCY = 4
+MAX_SEARCH_PAGE_SIZE = 500
+MAX_EXPORT_BATCH_SIZE = 200
+# Bytes of the messages of an export batch that are held in memory
+MAX_EXPORT_BATCH_BYTES = 10 * 1024 * 1024
+MAX_QUERY_INDEX_LIMIT = 500
+# UIDs per command of the services that apply to a search result
+BULK_CHUNK_SIZE = 500
+# Retries of a failed first refresh, doubling the delay up to the maximum
+FIRST_REFRESH_RETRY_DELAY = 10
+FIRST_REFRESH_MAX_RETRY_DELAY = 300
+
+UID_SET_RE = re.compile(r"^\d+(:\d+)?(,\d+(:\d+)?)*$")
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -83,14 +169,107 @@ SERVICE_MOVE_SCHEMA = _SERVICE_UID_SCHEMA.extend(
 SERVICE_DELETE_SCHEMA = _SERVICE_UID_SCHEMA
 SERVICE_FETCH_TEXT_SCHEMA = _SERVICE_UID_SCHEMA.extend(
     {
-        vol.Required(CONF_ATTACHMENT): cv.boolean,
+        # `attachment` selects the attachments or text mode if `mode` is not set
+        vol.Optional(CONF_ATTACHMENT, default=False): cv.boolean,
+        vol.Optional(CONF_MODE): vol.In(FETCH_MODES),
+        vol.Optional(CONF_HEADERS): vol.All(
+            cv.ensure_list, [vol.All(cv.string, vol.Match(HEADER_NAME_RE))]
+        ),
         vol.Optional(CONF_ATTACHMENT_FILTER): cv.string,
         vol.Optional(CONF_TIMEOUT): cv.string,
     }
 )
+SERVICE_FETCH_MANY_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Required(CONF_UIDS): vol.All(
+            cv.string, vol.Replace(r"\s+", ""), vol.Match(UID_SET_RE)
+        ),
+        vol.Optional(CONF_CONCURRENCY, default=2): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_FETCH_MANY_CONCURRENCY)
+        ),
+        vol.Optional(CONF_TIMEOUT): cv.string,
+    }
+)
 
+SERVICE_SEARCH_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Optional(CONF_CRITERIA, default="ALL"): cv.string,
+        vol.Optional(CONF_SORT): cv.string,
+        vol.Optional(CONF_PAGE_SIZE, default=50): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_SEARCH_PAGE_SIZE)
+        ),
+        vol.Optional(CONF_CURSOR): cv.string,
+    }
+)
+SERVICE_EXPORT_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Required(CONF_PATH): cv.string,
+        vol.Optional(CONF_FORMAT, default=EXPORT_FORMAT_MBOX): vol.In(EXPORT_FORMATS),
+        vol.Optional(CONF_FOLDER): cv.string,
+        vol.Optional(CONF_CRITERIA, default="ALL"): cv.string,
+        vol.Optional(CONF_BATCH_SIZE, default=20): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_EXPORT_BATCH_SIZE)
+        ),
+        vol.Optional(CONF_TIMEOUT): cv.string,
+    }
+)
+
+SERVICE_QUERY_INDEX_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Optional(CONF_SENDER): cv.string,
+        vol.Optional(CONF_SUBJECT): cv.string,
+        vol.Optional(CONF_SEEN): cv.boolean,
+        vol.Optional(CONF_FLAGGED): cv.boolean,
+        vol.Optional(CONF_SINCE): cv.datetime,
+        vol.Optional(CONF_LIMIT, default=10): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=MAX_QUERY_INDEX_LIMIT)
+        ),
+    }
+)
 
-async def async_get_imap_client(hass: HomeAssistant, entry_id: str, timeout=10) -> IMAP4:
+
+SERVICE_GET_EVENT_PAYLOAD_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Required(CONF_PAYLOAD_KEY): cv.string,
+    }
+)
+_SERVICE_BY_SEARCH_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Required(CONF_CRITERIA): cv.string,
+        vol.Optional(CONF_TIMEOUT): cv.string,
+    }
+)
+SERVICE_STORE_BY_SEARCH_SCHEMA = _SERVICE_BY_SEARCH_SCHEMA.extend(
+    {
+        vol.Required(CONF_TAG): cv.string,
+        vol.Optional(CONF_UNTAG): cv.boolean,
+    }
+)
+SERVICE_MOVE_BY_SEARCH_SCHEMA = _SERVICE_BY_SEARCH_SCHEMA.extend(
+    {
+        vol.Optional(CONF_SEEN): cv.boolean,
+        vol.Required(CONF_TARGET_FOLDER): cv.string,
+    }
+)
+SERVICE_DELETE_BY_SEARCH_SCHEMA = _SERVICE_BY_SEARCH_SCHEMA
+SERVICE_SET_TRACING_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_ENTRY): cv.string,
+        vol.Optional(CONF_TRACING): cv.boolean,
+        vol.Optional(CONF_PROFILING): cv.boolean,
+    }
+)
+
+
+async def async_get_imap_client(
+    hass: HomeAssistant, entry_id: str, timeout=10, folder: str | None = None
+) -> IMAP4:
     """Get IMAP client and connect."""
     if hass.data[DOMAIN].get(entry_id) is None:
         raise ServiceValidationError(
@@ -101,7 +280,8 @@ async def async_get_imap_client(hass: HomeAssistant, entry_id: str, timeout=10)
     if TYPE_CHECKING:
         assert entry is not None
     try:
-        client = await connect_to_server(entry.data, timeout=timeout)
+        data = entry.data if folder is None else {**entry.data, CONF_FOLDER: folder}
+        client = await connect_to_server(data, timeout=timeout)
     except InvalidAuth as exc:
         raise ServiceValidationError(
             translation_domain=DOMAIN, translation_key="invalid_auth"
@@ -119,6 +299,40 @@ async def async_get_imap_client(hass: HomeAssistant, entry_id: str, timeout=10)
     return client
 
 
+@asynccontextmanager
+async def async_imap_session(
+    hass: HomeAssistant,
+    entry_id: str,
+    priority: int,
+    timeout=10,
+    folder: str | None = None,
+) -> AsyncIterator[IMAP4]:
+    """Connect in a session scheduled by the entry and log out afterwards."""
+    coordinator: (
+        ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator | None
+    ) = hass.data[DOMAIN].get(entry_id)
+    if coordinator is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_entry",
+        )
+    try:
+        async with coordinator.scheduler.session(priority):
+            client = await async_get_imap_client(hass, entry_id, timeout, folder)
+            try:
+                yield client
+            finally:
+                await async_release_imap_client(client)
+    except SchedulerQueueTimeout as exc:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="session_queue_timeout",
+            translation_placeholders={
+                "timeout": str(coordinator.scheduler.queue_timeout)
+            },
+        ) from exc
+
+
 @callback
 def raise_on_error(response: Response, translation_key: str) -> None:
     """Get error message from response."""
@@ -131,6 +345,147 @@ def raise_on_error(response: Response, translation_key: str) -> None:
         )
 
 
+@callback
+def get_fetched_message(response: Response, uid: str) -> dict[str, Any]:
+    """Get the data of the fetched message with the UID from a response."""
+    if (
+        message_data := find_fetched_message(parse_fetch_response(response.lines), uid)
+    ) is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="fetch_failed",
+            translation_placeholders={"error": "Message not found"},
+        )
+    return message_data
+
+
+async def async_release_imap_client(client: IMAP4) -> None:
+    """Close the mailbox and log out from the server."""
+    try:
+        await client.close()
+        await client.logout()
+    except (TimeoutError, AioImapException):
+        _LOGGER.debug("Error while closing imap connection")
+
+
+def encode_search_cursor(
+    criteria: str, sort: str | None, position: int, result: str | None = None
+) -> str:
+    """Encode the position in a search result as an opaque cursor.
+
+    `result` is the key of the cached sorted search result.
+    """
+    cursor = json.dumps(
+        {"criteria": criteria, "sort": sort, "position": position, "result": result}
+    )
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+
+def decode_search_cursor(
+    cursor: str, criteria: str, sort: str | None
+) -> tuple[int, str | None]:
+    """Decode a search cursor, return the position and the cached result key."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if data["criteria"] == criteria and data["sort"] == sort:
+            return int(data["position"]), data.get("result")
+    except (ValueError, KeyError, TypeError):
+        pass
+    raise ServiceValidationError(
+        translation_domain=DOMAIN,
+        translation_key="invalid_cursor",
+    )
+
+
+def expand_uid_set(uid_set: str) -> list[int]:
+    """Expand an IMAP UID set to a list of unique UIDs in the given order."""
+    uids: dict[int, None] = {}
+    for uid_range in uid_set.split(","):
+        first, _, last = uid_range.partition(":")
+        start, stop = int(first), int(last or first)
+        step = 1 if stop >= start else -1
+        for uid in range(start, stop + step, step):
+            uids[uid] = None
+            if len(uids) > MAX_FETCH_MANY_MESSAGES:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="too_many_messages",
+                    translation_placeholders={"limit": str(MAX_FETCH_MANY_MESSAGES)},
+                )
+    return list(uids)
+
+
+def get_delete_commands(uid_set: str) -> list[tuple[str, list[str], str]]:
+    """Return the commands that delete a UID set, with their error keys."""
+    return [
+        ("STORE", [uid_set, "+FLAGS.SILENT (\\Deleted)"], "delete_failed"),
+        ("EXPUNGE", [uid_set], "expunge_failed"),
+    ]
+
+
+def compress_uid_set(uids: list[int]) -> str:
+    """Return an IMAP UID set of sorted UIDs with ranges for consecutive UIDs."""
+    ranges: list[list[int]] = []
+    for uid in uids:
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(
+        str(first) if first == last else f"{first}:{last}" for first, last in ranges
+    )
+
+
+async def async_fetch_messages(
+    client: IMAP4, uids: list[int]
+) -> dict[int, dict[str, Any]]:
+    """Fetch the headers and text of multiple messages in two batches."""
+    response = await client.uid(
+        "fetch",
+        ",".join(str(uid) for uid in uids),
+        "(UID BODYSTRUCTURE BODY.PEEK[HEADER])",
+    )
+    raise_on_error(response, "fetch_failed")
+    messages: dict[int, ImapMessage] = {}
+    text_parts: dict[int, dict[str, Any]] = {}
+    # Messages with the same text section are fetched together
+    part_uids: dict[str, list[int]] = {}
+    for message_data in parse_fetch_response(response.lines):
+        if (uid := message_data.get("UID")) is None:
+            continue
+        messages[uid] = ImapMessage(fetch_item(message_data, "BODY[HEADER") or b"")
+        text_part = find_text_part(
+            parse_bodystructure(fetch_item(message_data, "BODYSTRUCTURE") or [])
+        )
+        if text_part is not None:
+            text_parts[uid] = text_part
+            part_uids.setdefault(text_part["part"], []).append(uid)
+
+    for part, section_uids in part_uids.items():
+        response = await client.uid(
+            "fetch",
+            ",".join(str(uid) for uid in section_uids),
+            f"(UID BODY.PEEK[{part}])",
+        )
+        raise_on_error(response, "fetch_failed")
+        for message_data in parse_fetch_response(response.lines):
+            if (uid := message_data.get("UID")) in messages:
+                messages[uid].set_text_part(
+                    fetch_item(message_data, f"BODY[{part}]") or b"", text_parts[uid]
+                )
+
+    return {
+        uid: {
+            "text": message.text if uid in text_parts else "",
+            "sender": message.sender,
+            "subject": message.subject,
+            "date": message.date.isoformat() if message.date else None,
+            "uid": str(uid),
+        }
+        for uid, message in messages.items()
+    }
+
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up imap services."""
 
@@ -146,17 +501,18 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
             uid,
             entry_id,
         )
-        client = await async_get_imap_client(hass, entry_id)
-        try:
-            response = await client.store(uid, "%sFLAGS (%s)" % (untag, call.data[CONF_TAG]))
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        raise_on_error(response, "tag_failed")
-        await client.close()
+        async with async_imap_session(hass, entry_id, PRIORITY_BULK) as client:
+            try:
+                response = await client.uid(
+                    "store", uid, "%sFLAGS (%s)" % (untag, call.data[CONF_TAG])
+                )
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+            raise_on_error(response, "tag_failed")
 
     hass.services.async_register(DOMAIN, "tag", async_tag, SERVICE_TAG_SCHEMA)
 
@@ -169,17 +525,16 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
             uid,
             entry_id,
         )
-        client = await async_get_imap_client(hass, entry_id)
-        try:
-            response = await client.store(uid, "+FLAGS (\\Seen)")
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        raise_on_error(response, "seen_failed")
-        await client.close()
+        async with async_imap_session(hass, entry_id, PRIORITY_BULK) as client:
+            try:
+                response = await client.uid("store", uid, "+FLAGS (\\Seen)")
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+            raise_on_error(response, "seen_failed")
 
     hass.services.async_register(DOMAIN, "seen", async_seen, SERVICE_SEEN_SCHEMA)
 
@@ -196,26 +551,43 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
             seen,
             entry_id,
         )
-        client = await async_get_imap_client(hass, entry_id)
-        try:
-            if seen:
-                response = await client.store(uid, "+FLAGS (\\Seen)")
-                raise_on_error(response, "seen_failed")
-            response = await client.copy(uid, target_folder)
-            raise_on_error(response, "copy_failed")
-            response = await client.store(uid, "+FLAGS (\\Deleted)")
-            raise_on_error(response, "delete_failed")
-            response = await asyncio.wait_for(
-                client.protocol.expunge(uid, by_uid=True), client.timeout
+        async with async_imap_session(hass, entry_id, PRIORITY_BULK) as client:
+            try:
+                pipeline = ImapPipeline(client)
+                if seen:
+                    pipeline.add(
+                        "STORE", uid, "+FLAGS.SILENT (\\Seen)", by_uid=True
+                    )
+                if client.has_capability("MOVE"):
+                    pipeline.add("MOVE", uid, target_folder, by_uid=True)
+                    responses = await pipeline.execute()
+                    raise_on_error(responses[-1], "move_failed")
+                else:
+                    # Only flag the message for deletion after the copy worked
+                    pipeline.add("COPY", uid, target_folder, by_uid=True)
+                    responses = await pipeline.execute()
+                    raise_on_error(responses[-1], "copy_failed")
+                    delete_response, expunge_response = await (
+                        ImapPipeline(client)
+                        .add("STORE", uid, "+FLAGS.SILENT (\\Deleted)", by_uid=True)
+                        .add("EXPUNGE", uid, by_uid=True)
+                        .execute()
+                    )
+                    raise_on_error(delete_response, "delete_failed")
+                    raise_on_error(expunge_response, "expunge_failed")
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+        # The message was moved, so a missing flag is only worth a warning
+        if seen and responses[0].result != "OK":
+            _LOGGER.warning(
+                "Marking message %s as seen failed: %s",
+                uid,
+                responses[0].lines[0].decode("utf-8"),
             )
-            raise_on_error(response, "expunge_failed")
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        await client.close()
 
     hass.services.async_register(DOMAIN, "move", async_move, SERVICE_MOVE_SCHEMA)
 
@@ -228,21 +600,22 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
             uid,
             entry_id,
         )
-        client = await async_get_imap_client(hass, entry_id)
-        try:
-            response = await client.store(uid, "+FLAGS (\\Deleted)")
-            raise_on_error(response, "delete_failed")
-            response = await asyncio.wait_for(
-                client.protocol.expunge(uid, by_uid=True), client.timeout
-            )
-            raise_on_error(response, "expunge_failed")
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        await client.close()
+        async with async_imap_session(hass, entry_id, PRIORITY_BULK) as client:
+            try:
+                delete_response, expunge_response = await (
+                    ImapPipeline(client)
+                    .add("STORE", uid, "+FLAGS.SILENT (\\Deleted)", by_uid=True)
+                    .add("EXPUNGE", uid, by_uid=True)
+                    .execute()
+                )
+                raise_on_error(delete_response, "delete_failed")
+                raise_on_error(expunge_response, "expunge_failed")
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
 
     hass.services.async_register(DOMAIN, "delete", async_delete, SERVICE_DELETE_SCHEMA)
 
@@ -250,50 +623,104 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         """Process fetch email service and return content."""
         entry_id: str = call.data[CONF_ENTRY]
         uid: str = call.data[CONF_UID]
+        mode: str = call.data.get(
+            CONF_MODE,
+            FETCH_MODE_ATTACHMENTS if call.data[CONF_ATTACHMENT] else FETCH_MODE_TEXT,
+        )
         timeout: int = 10
         if call.data.get(CONF_TIMEOUT, ""):
             timeout = int(call.data[CONF_TIMEOUT])
         _LOGGER.debug(
-            "Fetch text for message %s. Entry: %s",
+            "Fetch %s for message %s. Entry: %s",
+            mode,
             uid,
             entry_id,
         )
-        client = await async_get_imap_client(hass, entry_id, timeout=timeout)
-        try:
-            response = await client.fetch(uid, "BODYSTRUCTURE")
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        raise_on_error(response, "fetch_failed")
-
-        txtpart = ""
-        parts = ImapParts.get_parts(response.lines[0].decode("utf-8"))
-        for p in parts.print_tree():
-            if "text" in p:
-                txtpart = p.split(" ")[0]
-                break
-
-        try:
-            if call.data[CONF_ATTACHMENT]:
-                response = await client.fetch(uid, "BODY.PEEK[]")
-            else:
-                response = await client.fetch(uid, "BODY.PEEK[HEADER]")
-                body = await client.fetch(uid, "BODY.PEEK[{0}]".format(txtpart))
-        except (TimeoutError, AioImapException) as exc:
-            raise ServiceValidationError(
-                translation_domain=DOMAIN,
-                translation_key="imap_server_fail",
-                translation_placeholders={"error": str(exc)},
-            ) from exc
-        raise_on_error(response, "fetch_failed")
-        message = ImapMessage(response.lines[1])
-        if not call.data[CONF_ATTACHMENT]:
-            message.set_content(body.lines[1])
-        await client.close()
-        if call.data[CONF_ATTACHMENT]:
+        async with async_imap_session(
+            hass, entry_id, PRIORITY_INTERACTIVE, timeout=timeout
+        ) as client:
+            try:
+                if mode == FETCH_MODE_STRUCTURE:
+                    response = await client.uid(
+                        "fetch", uid, "(RFC822.SIZE BODYSTRUCTURE)"
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    message_data = get_fetched_message(response, uid)
+                    structure = parse_bodystructure(
+                        fetch_item(message_data, "BODYSTRUCTURE") or []
+                    )
+                    return {
+                        "uid": uid,
+                        "size": fetch_item(message_data, "RFC822.SIZE"),
+                        "structure": structure,
+                        "attachments": [
+                            part
+                            for part in iter_body_parts(structure)
+                            if part["filename"]
+                        ],
+                    }
+                if mode == FETCH_MODE_HEADERS:
+                    section = "HEADER"
+                    if call.data.get(CONF_HEADERS):
+                        header_fields = " ".join(call.data[CONF_HEADERS]).upper()
+                        section = f"HEADER.FIELDS ({header_fields})"
+                    response = await client.uid(
+                        "fetch", uid, f"BODY.PEEK[{section}]"
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    message = ImapMessage(
+                        fetch_item(
+                            get_fetched_message(response, uid), "BODY[HEADER"
+                        )
+                        or b""
+                    )
+                    return {
+                        "sender": message.sender,
+                        "subject": message.subject,
+                        "uid": uid,
+                        "headers": message.headers,
+                    }
+                if mode == FETCH_MODE_ATTACHMENTS:
+                    response = await client.uid("fetch", uid, "BODY.PEEK[]")
+                    raise_on_error(response, "fetch_failed")
+                    message = ImapMessage(
+                        fetch_item(get_fetched_message(response, uid), "BODY[]")
+                        or b""
+                    )
+                else:
+                    # The structure is needed to know which part has the text
+                    response = await client.uid(
+                        "fetch", uid, "(BODYSTRUCTURE BODY.PEEK[HEADER])"
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    message_data = get_fetched_message(response, uid)
+                    message = ImapMessage(
+                        fetch_item(message_data, "BODY[HEADER") or b""
+                    )
+                    text_part = find_text_part(
+                        parse_bodystructure(
+                            fetch_item(message_data, "BODYSTRUCTURE") or []
+                        )
+                    )
+                    if text_part is not None:
+                        response = await client.uid(
+                            "fetch", uid, f"BODY.PEEK[{text_part['part']}]"
+                        )
+                        raise_on_error(response, "fetch_failed")
+                        message.set_text_part(
+                            fetch_item(
+                                get_fetched_message(response, uid), "BODY["
+                            )
+                            or b"",
+                            text_part,
+                        )
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+        if mode == FETCH_MODE_ATTACHMENTS:
             if call.data.get(CONF_ATTACHMENT_FILTER, ""):
                 attachments = []
                 for attachment in message.attachments:
@@ -324,33 +751,570 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
         supports_response=SupportsResponse.ONLY,
     )
 
+    async def async_fetch_many(call: ServiceCall) -> ServiceResponse:
+        """Process fetch many emails service and return their content."""
+        entry_id: str = call.data[CONF_ENTRY]
+        uids = expand_uid_set(call.data[CONF_UIDS])
+        timeout: int = 10
+        if call.data.get(CONF_TIMEOUT, ""):
+            timeout = int(call.data[CONF_TIMEOUT])
+        _LOGGER.debug(
+            "Fetch text for %s messages. Entry: %s",
+            len(uids),
+            entry_id,
+        )
+        chunks = [
+            uids[index : index + FETCH_MANY_CHUNK_SIZE]
+            for index in range(0, len(uids), FETCH_MANY_CHUNK_SIZE)
+        ]
+        pending = iter(chunks)
+        results: dict[int, dict[str, Any]] = {}
+
+        async def async_fetch_worker() -> None:
+            """Fetch chunks of messages on a single connection."""
+            async with async_imap_session(
+                hass, entry_id, PRIORITY_INTERACTIVE, timeout=timeout
+            ) as client:
+                try:
+                    for chunk in pending:
+                        results.update(await async_fetch_messages(client, chunk))
+                except (TimeoutError, AioImapException) as exc:
+                    raise ServiceValidationError(
+                        translation_domain=DOMAIN,
+                        translation_key="imap_server_fail",
+                        translation_placeholders={"error": str(exc)},
+                    ) from exc
+
+        await asyncio.gather(
+            *(
+                async_fetch_worker()
+                for _ in range(min(call.data[CONF_CONCURRENCY], len(chunks)))
+            )
+        )
+        return {"messages": [results[uid] for uid in uids if uid in results]}
+
+    hass.services.async_register(
+        DOMAIN,
+        "fetch_many",
+        async_fetch_many,
+        SERVICE_FETCH_MANY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_search(call: ServiceCall) -> ServiceResponse:
+        """Process search service and return a page of message envelopes."""
+        entry_id: str = call.data[CONF_ENTRY]
+        criteria: str = call.data[CONF_CRITERIA]
+        sort: str | None = call.data.get(CONF_SORT)
+        page_size: int = call.data[CONF_PAGE_SIZE]
+        position = 0
+        result_key: str | None = None
+        if cursor := call.data.get(CONF_CURSOR):
+            position, result_key = decode_search_cursor(cursor, criteria, sort)
+        _LOGGER.debug(
+            "Search messages with criteria %s, sort: %s, position: %s. Entry: %s",
+            criteria,
+            sort,
+            position,
+            entry_id,
+        )
+        async with async_imap_session(hass, entry_id, PRIORITY_INTERACTIVE) as client:
+            entry = hass.config_entries.async_get_entry(entry_id)
+            if TYPE_CHECKING:
+                assert entry is not None
+            charset: str = entry.data[CONF_CHARSET]
+            messages: list[dict[str, Any]] = []
+            if sort and not client.has_capability("SORT"):
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="sort_not_supported",
+                )
+            try:
+                if sort:
+                    # The position is the offset in the sorted result, which
+                    # is sorted once and kept for the next pages
+                    sort_results = hass.data[DOMAIN][entry_id].sort_results
+                    if result_key is None or (
+                        uids := sort_results.get(result_key)
+                    ) is None:
+                        response = await asyncio.wait_for(
+                            client.protocol.execute(
+                                Command(
+                                    "SORT",
+                                    client.protocol.new_tag(),
+                                    f"({sort})",
+                                    charset,
+                                    criteria,
+                                    prefix="UID",
+                                    loop=client.protocol.loop,
+                                )
+                            ),
+                            client.timeout,
+                        )
+                        raise_on_error(response, "search_failed")
+                        uids = [int(uid) for uid in response.lines[0].split()]
+                        result_key = uuid4().hex
+                        sort_results.set(result_key, uids)
+                    page = uids[position : position + page_size]
+                    next_position = position + len(page)
+                    remaining = len(uids) - next_position
+                else:
+                    # The position is the last returned UID, the server skips
+                    # everything up to it
+                    search_criteria = [criteria]
+                    if position:
+                        search_criteria.insert(0, f"UID {position + 1}:*")
+                    response = await client.uid_search(
+                        *search_criteria, charset=charset
+                    )
+                    raise_on_error(response, "search_failed")
+                    uids = [
+                        uid
+                        for uid in map(int, response.lines[0].split())
+                        if uid > position
+                    ]
+                    page = uids[:page_size]
+                    next_position = page[-1] if page else position
+                    remaining = len(uids) - len(page)
+                if page:
+                    response = await client.uid(
+                        "fetch",
+                        ",".join(str(uid) for uid in page),
+                        "(UID FLAGS RFC822.SIZE ENVELOPE)",
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    fetched = {
+                        message_data["UID"]: message_data
+                        for message_data in parse_fetch_response(response.lines)
+                        if "UID" in message_data
+                    }
+                    messages = [
+                        {
+                            "uid": str(uid),
+                            "flags": fetched[uid].get("FLAGS") or [],
+                            "size": fetched[uid].get("RFC822.SIZE"),
+                            "envelope": parse_envelope(fetched[uid].get("ENVELOPE")),
+                        }
+                        for uid in page
+                        if uid in fetched
+                    ]
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+        return {
+            "messages": messages,
+            "remaining": remaining,
+            "cursor": (
+                encode_search_cursor(criteria, sort, next_position, result_key)
+                if remaining
+                else None
+            ),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "search",
+        async_search,
+        SERVICE_SEARCH_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_export(call: ServiceCall) -> ServiceResponse:
+        """Process export service and stream messages to a local mailbox."""
+        entry_id: str = call.data[CONF_ENTRY]
+        path: str = call.data[CONF_PATH]
+        export_format: str = call.data[CONF_FORMAT]
+        criteria: str = call.data[CONF_CRITERIA]
+        batch_size: int = call.data[CONF_BATCH_SIZE]
+        timeout: int = 10
+        if call.data.get(CONF_TIMEOUT, ""):
+            timeout = int(call.data[CONF_TIMEOUT])
+        if not hass.config.is_allowed_path(path):
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="path_not_allowed",
+                translation_placeholders={"path": path},
+            )
+        entry = hass.config_entries.async_get_entry(entry_id)
+        folder: str | None = call.data.get(CONF_FOLDER)
+        if folder is None and entry is not None:
+            folder = entry.data[CONF_FOLDER]
+        _LOGGER.debug(
+            "Export folder %s with criteria %s to %s %s. Entry: %s",
+            folder,
+            criteria,
+            export_format,
+            path,
+            entry_id,
+        )
+        async with async_imap_session(
+            hass, entry_id, PRIORITY_BULK, timeout=timeout, folder=folder
+        ) as client:
+            if TYPE_CHECKING:
+                assert entry is not None
+            writer = None
+            exported = 0
+            try:
+                uidvalidity = get_selected_uidvalidity(client)
+                checkpoint = await hass.async_add_executor_job(
+                    load_checkpoint, export_format, path
+                ) or {"exported": 0, "last_uid": 0}
+                export_source = {
+                    "uidvalidity": uidvalidity,
+                    "folder": folder,
+                    "criteria": criteria,
+                }
+                # Resuming is only possible for the same folder, search and UIDs
+                if any(
+                    checkpoint.get(key, value) != value
+                    for key, value in export_source.items()
+                ):
+                    raise ServiceValidationError(
+                        translation_domain=DOMAIN,
+                        translation_key="export_checkpoint_mismatch",
+                        translation_placeholders={"path": path},
+                    )
+                checkpoint.update(export_source)
+                last_uid: int = checkpoint["last_uid"]
+                search_criteria = [criteria]
+                if last_uid:
+                    search_criteria.insert(0, f"UID {last_uid + 1}:*")
+                response = await client.uid_search(
+                    *search_criteria, charset=entry.data[CONF_CHARSET]
+                )
+                raise_on_error(response, "search_failed")
+                uids = [
+                    uid for uid in map(int, response.lines[0].split()) if uid > last_uid
+                ]
+                sizes: dict[int, int | None] = {}
+                for index in range(0, len(uids), BULK_CHUNK_SIZE):
+                    response = await client.uid(
+                        "fetch",
+                        compress_uid_set(uids[index : index + BULK_CHUNK_SIZE]),
+                        "(UID RFC822.SIZE)",
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    sizes.update(
+                        (message_data["UID"], message_data.get("RFC822.SIZE"))
+                        for message_data in parse_fetch_response(response.lines)
+                        if "UID" in message_data
+                    )
+                writer = await hass.async_add_executor_job(
+                    create_writer, export_format, path, checkpoint
+                )
+                # Save where the file resumes before the first batch is written
+                await hass.async_add_executor_job(
+                    write_batch, writer, [], export_format, path, checkpoint
+                )
+                for batch in iter_batches(
+                    [(uid, sizes.get(uid)) for uid in uids],
+                    batch_size,
+                    MAX_EXPORT_BATCH_BYTES,
+                ):
+                    response = await client.uid(
+                        "fetch",
+                        compress_uid_set(batch),
+                        "(UID FLAGS INTERNALDATE BODY.PEEK[])",
+                    )
+                    raise_on_error(response, "fetch_failed")
+                    fetched = {
+                        message_data["UID"]: message_data
+                        for message_data in parse_fetch_response(response.lines)
+                        if "UID" in message_data
+                    }
+                    messages = [
+                        (
+                            uid,
+                            fetch_item(fetched[uid], "BODY[]") or b"",
+                            parse_internaldate(fetched[uid].get("INTERNALDATE")),
+                            fetched[uid].get("FLAGS") or [],
+                        )
+                        for uid in batch
+                        if uid in fetched
+                    ]
+                    exported += len(messages)
+                    checkpoint["exported"] += len(messages)
+                    checkpoint["last_uid"] = batch[-1]
+                    # The messages of a batch are released once they are written
+                    await hass.async_add_executor_job(
+                        write_batch, writer, messages, export_format, path, checkpoint
+                    )
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+            except OSError as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="export_failed",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+            finally:
+                if writer is not None:
+                    await hass.async_add_executor_job(writer.close)
+        return {
+            "path": path,
+            "exported": exported,
+            "total": checkpoint["exported"],
+            "last_uid": str(checkpoint["last_uid"]),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "export",
+        async_export,
+        SERVICE_EXPORT_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_query_index(call: ServiceCall) -> ServiceResponse:
+        """Answer a query from the local message index."""
+        entry_id: str = call.data[CONF_ENTRY]
+        coordinator: (
+            ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator | None
+        ) = hass.data[DOMAIN].get(entry_id)
+        if coordinator is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_entry",
+            )
+        if coordinator.message_index is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="index_disabled",
+            )
+        since: datetime | None = call.data.get(CONF_SINCE)
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=dt_util.get_default_time_zone())
+        try:
+            return await hass.async_add_executor_job(
+                partial(
+                    coordinator.message_index.query,
+                    sender=call.data.get(CONF_SENDER),
+                    subject=call.data.get(CONF_SUBJECT),
+                    seen=call.data.get(CONF_SEEN),
+                    flagged=call.data.get(CONF_FLAGGED),
+                    since=since,
+                    limit=call.data[CONF_LIMIT],
+                )
+            )
+        except sqlite3.Error as exc:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="index_failed",
+                translation_placeholders={"error": str(exc)},
+            ) from exc
+
+    hass.services.async_register(
+        DOMAIN,
+        "query_index",
+        async_query_index,
+        SERVICE_QUERY_INDEX_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_get_event_payload(call: ServiceCall) -> ServiceResponse:
+        """Return the cached payload of a reference event."""
+        entry_id: str = call.data[CONF_ENTRY]
+        coordinator: (
+            ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator | None
+        ) = hass.data[DOMAIN].get(entry_id)
+        if coordinator is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_entry",
+            )
+        if (
+            payload := coordinator.event_payloads.get(call.data[CONF_PAYLOAD_KEY])
+        ) is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="payload_not_found",
+            )
+        date: datetime | None = payload.get("date")
+        return {**payload, "date": date.isoformat() if date else None}
+
+    hass.services.async_register(
+        DOMAIN,
+        "get_event_payload",
+        async_get_event_payload,
+        SERVICE_GET_EVENT_PAYLOAD_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def async_apply_by_search(
+        call: ServiceCall,
+        get_stages: Callable[[IMAP4, str], list[list[tuple[str, list[str], str]]]],
+        warn_only: frozenset[str] = frozenset(),
+    ) -> ServiceResponse:
+        """Search messages once and apply commands to the result in chunks.
+
+        `get_stages` returns the pipelines to run for a UID set, as lists of
+        command names, arguments and error translation keys. A pipeline only
+        runs if the previous one succeeded. Failures of commands with a
+        translation key in `warn_only` are only logged.
+        """
+        entry_id: str = call.data[CONF_ENTRY]
+        criteria: str = call.data[CONF_CRITERIA]
+        timeout: int = 10
+        if call.data.get(CONF_TIMEOUT, ""):
+            timeout = int(call.data[CONF_TIMEOUT])
+        async with async_imap_session(
+            hass, entry_id, PRIORITY_BULK, timeout=timeout
+        ) as client:
+            entry = hass.config_entries.async_get_entry(entry_id)
+            if TYPE_CHECKING:
+                assert entry is not None
+            try:
+                response = await client.uid_search(
+                    criteria, charset=entry.data[CONF_CHARSET]
+                )
+                raise_on_error(response, "search_failed")
+                uids = sorted(map(int, response.lines[0].split()))
+                _LOGGER.debug(
+                    "Apply %s to %s messages matching %s. Entry: %s",
+                    call.service,
+                    len(uids),
+                    criteria,
+                    entry_id,
+                )
+                for index in range(0, len(uids), BULK_CHUNK_SIZE):
+                    uid_set = compress_uid_set(uids[index : index + BULK_CHUNK_SIZE])
+                    for stage in get_stages(client, uid_set):
+                        pipeline = ImapPipeline(client)
+                        for name, args, _ in stage:
+                            pipeline.add(name, *args, by_uid=True)
+                        responses = await pipeline.execute()
+                        for (name, _, translation_key), stage_response in zip(
+                            stage, responses
+                        ):
+                            if translation_key not in warn_only:
+                                raise_on_error(stage_response, translation_key)
+                            elif stage_response.result != "OK":
+                                _LOGGER.warning(
+                                    "%s of messages %s failed: %s",
+                                    name,
+                                    uid_set,
+                                    stage_response.lines[0].decode("utf-8"),
+                                )
+            except (TimeoutError, AioImapException) as exc:
+                raise ServiceValidationError(
+                    translation_domain=DOMAIN,
+                    translation_key="imap_server_fail",
+                    translation_placeholders={"error": str(exc)},
+                ) from exc
+        return {"count": len(uids)}
+
+    async def async_store_by_search(call: ServiceCall) -> ServiceResponse:
+        """Add or remove a flag on all messages matching a search."""
+        flags = "%sFLAGS.SILENT (%s)" % (
+            "-" if call.data.get(CONF_UNTAG) else "+",
+            call.data[CONF_TAG],
+        )
+        return await async_apply_by_search(
+            call, lambda client, uid_set: [[("STORE", [uid_set, flags], "tag_failed")]]
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        "store_by_search",
+        async_store_by_search,
+        SERVICE_STORE_BY_SEARCH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_move_by_search(call: ServiceCall) -> ServiceResponse:
+        """Move all messages matching a search to a target folder."""
+        seen = bool(call.data.get(CONF_SEEN))
+        target_folder: str = call.data[CONF_TARGET_FOLDER]
+
+        def get_stages(
+            client: IMAP4, uid_set: str
+        ) -> list[list[tuple[str, list[str], str]]]:
+            """Return the commands that move a UID set."""
+            stage: list[tuple[str, list[str], str]] = []
+            if seen:
+                stage.append(
+                    ("STORE", [uid_set, "+FLAGS.SILENT (\\Seen)"], "seen_failed")
+                )
+            if client.has_capability("MOVE"):
+                return [[*stage, ("MOVE", [uid_set, target_folder], "move_failed")]]
+            # Only flag the messages for deletion after the copy worked
+            return [
+                [*stage, ("COPY", [uid_set, target_folder], "copy_failed")],
+                get_delete_commands(uid_set),
+            ]
+
+        # A missing flag on moved messages is only worth a warning
+        return await async_apply_by_search(
+            call, get_stages, warn_only=frozenset({"seen_failed"})
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        "move_by_search",
+        async_move_by_search,
+        SERVICE_MOVE_BY_SEARCH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_delete_by_search(call: ServiceCall) -> ServiceResponse:
+        """Delete all messages matching a search."""
+        return await async_apply_by_search(
+            call, lambda client, uid_set: [get_delete_commands(uid_set)]
+        )
+
+    hass.services.async_register(
+        DOMAIN,
+        "delete_by_search",
+        async_delete_by_search,
+        SERVICE_DELETE_BY_SEARCH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_set_tracing(call: ServiceCall) -> None:
+        """Turn tracing and profiling of the message processing on or off."""
+        entry_id: str = call.data[CONF_ENTRY]
+        coordinator: (
+            ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator | None
+        ) = hass.data[DOMAIN].get(entry_id)
+        if coordinator is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="invalid_entry",
+            )
+        if CONF_TRACING in call.data:
+            coordinator.tracer.enabled = call.data[CONF_TRACING]
+        if CONF_PROFILING in call.data:
+            coordinator.tracer.set_profiling(call.data[CONF_PROFILING])
+
+    hass.services.async_register(
+        DOMAIN, "set_tracing", async_set_tracing, SERVICE_SET_TRACING_SCHEMA
+    )
+
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up imap from a config entry."""
-    try:
-        imap_client: IMAP4 = await connect_to_server(dict(entry.data))
-    except InvalidAuth as err:
-        raise ConfigEntryAuthFailed from err
-    except InvalidFolder as err:
-        raise ConfigEntryError("Selected mailbox folder is invalid.") from err
-    except (TimeoutError, AioImapException) as err:
-        raise ConfigEntryNotReady from err
-
     coordinator_class: type[
         ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator
     ]
-    enable_push: bool = entry.data.get(CONF_ENABLE_PUSH, True)
-    if enable_push and imap_client.has_capability("IDLE"):
+    # Push falls back to polling if the server turns out not to support IDLE
+    if entry.data.get(CONF_ENABLE_PUSH, True):
         coordinator_class = ImapPushDataUpdateCoordinator
     else:
         coordinator_class = ImapPollingDataUpdateCoordinator
 
     coordinator: ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator = (
-        coordinator_class(hass, imap_client, entry)
+        coordinator_class(hass, None, entry)
     )
-    await coordinator.async_config_entry_first_refresh()
+    await coordinator.async_load_state()
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
@@ -360,9 +1324,41 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # Connect and run the first sync without delaying the startup,
+    # the sensor is unavailable until it completes
+    entry.async_create_background_task(
+        hass,
+        async_first_refresh(coordinator),
+        f"IMAP first refresh {entry.title}",
+    )
+
     return True
 
 
+async def async_first_refresh(
+    coordinator: ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator,
+) -> None:
+    """Run the first refresh, retrying soon if the server is unreachable.
+
+    A polling entry would otherwise stay unavailable until the next poll.
+    Invalid credentials or an invalid folder are not retried, the
+    coordinator already started the reauthentication or logged the error.
+    """
+    delay = FIRST_REFRESH_RETRY_DELAY
+    await coordinator.async_refresh()
+    while not coordinator.last_update_success and not isinstance(
+        coordinator.last_exception, (ConfigEntryAuthFailed, ConfigEntryError)
+    ):
+        _LOGGER.debug(
+            "First refresh of %s failed, retrying in %s s",
+            coordinator.config_entry.title,
+            delay,
+        )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, FIRST_REFRESH_MAX_RETRY_DELAY)
+        await coordinator.async_refresh()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
@@ -372,6 +1368,13 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         await coordinator.shutdown()
     return unload_ok
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored sync state and message index of a config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+    index_path = Path(hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry.entry_id}.db"))
+    await hass.async_add_executor_job(partial(index_path.unlink, missing_ok=True))
+
+
 async def async_migrate_entry(hass, config_entry: ConfigEntry):
         """Migrate old entry."""
         if config_entry.version > 1:
@@ -0,0 +1,110 @@
+"""Authentication with as few round trips as possible.
+
+Most servers send their capabilities in the greeting and again in the
+response to the authentication, so the separate CAPABILITY command that
+aioimaplib sends after the greeting is only needed when they do not.
+SASL-IR (RFC 4959) sends the credentials with AUTHENTICATE PLAIN without
+waiting for a continuation request.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import re
+
+from aioimaplib import (
+    AUTH,
+    IMAP4,
+    NONAUTH,
+    AllowedVersions,
+    Command,
+    IMAP4ClientProtocol,
+    Response,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPABILITY_SASL_IR = "SASL-IR"
+CAPABILITY_AUTH_PLAIN = "AUTH=PLAIN"
+
+CAPABILITY_RE = re.compile(rb"(?:^|\[)CAPABILITY ([^\]\r\n]+)", re.IGNORECASE)
+
+
+def parse_capabilities(lines: list[bytes]) -> set[str] | None:
+    """Return the capabilities of untagged responses or response codes."""
+    for line in lines:
+        if (match := CAPABILITY_RE.search(line)) is not None:
+            return set(match.group(1).decode().split())
+    return None
+
+
+def _set_capabilities(protocol: IMAP4ClientProtocol, capabilities: set[str]) -> bool:
+    """Set the capabilities of a connection if it is an IMAP4 server."""
+    versions = [
+        capability.upper()
+        for capability in capabilities
+        if capability.upper() in AllowedVersions
+    ]
+    if not versions:
+        return False
+    protocol.capabilities = capabilities
+    protocol.imap_version = max(versions)
+    return True
+
+
+def use_greeting_capabilities(client: IMAP4) -> None:
+    """Take the capabilities from the greeting of the server if it has them.
+
+    Must be called before the connection is made, which is before the
+    event loop runs again after the client is created.
+    """
+    protocol = client.protocol
+    welcome = protocol.welcome
+
+    async def _welcome(line: bytes) -> None:
+        capabilities = parse_capabilities([line])
+        if (
+            capabilities is None
+            or (b"PREAUTH" not in line and b"OK" not in line)
+            or not _set_capabilities(protocol, capabilities)
+        ):
+            await welcome(line)
+            return
+        async with protocol.state_condition:
+            protocol.state = AUTH if b"PREAUTH" in line else NONAUTH
+            protocol.state_condition.notify_all()
+
+    protocol.welcome = _welcome
+
+
+async def async_authenticate(client: IMAP4, username: str, password: str) -> Response:
+    """Log in with SASL-IR if the server supports it, or with LOGIN otherwise."""
+    if not (
+        client.has_capability(CAPABILITY_SASL_IR)
+        and client.has_capability(CAPABILITY_AUTH_PLAIN)
+    ):
+        return await client.login(username, password)
+    protocol = client.protocol
+    initial_response = base64.b64encode(
+        f"\0{username}\0{password}".encode()
+    ).decode()
+    async with protocol.state_condition:
+        response = await protocol.execute(
+            Command(
+                "AUTHENTICATE",
+                protocol.new_tag(),
+                "PLAIN",
+                initial_response,
+                loop=protocol.loop,
+                timeout=client.timeout,
+            )
+        )
+        if response.result == "OK":
+            protocol.state = AUTH
+            if (capabilities := parse_capabilities(response.lines)) is not None:
+                # The capabilities after authentication replace the ones before
+                _set_capabilities(protocol, capabilities)
+        protocol.state_condition.notify_all()
+    _LOGGER.debug("AUTHENTICATE PLAIN result: %s", response.result)
+    return response
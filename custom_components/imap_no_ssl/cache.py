@@ -0,0 +1,59 @@
+"""Bounded in-memory caches."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import Generic, TypeVar
+
+_T = TypeVar("_T")
+
+
+class TTLCache(Generic[_T]):
+    """Cache of entries that expire `ttl` seconds after their last use.
+
+    Reading an entry renews it, the least recently used entry is dropped
+    when the cache is full. Expired entries are removed when the cache is
+    accessed, so no timer is needed.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        """Initialize the cache."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, _T]] = OrderedDict()
+
+    def _expire(self) -> None:
+        """Remove the expired entries."""
+        now = time.monotonic()
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[key]
+
+    def set(self, key: str, value: _T) -> None:
+        """Add or replace an entry."""
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._expire()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> _T | None:
+        """Return and renew an entry if it is in the cache and has not expired."""
+        self._expire()
+        if (entry := self._entries.pop(key, None)) is None:
+            return None
+        # The entries stay in the order in which they expire
+        self._entries[key] = (time.monotonic() + self.ttl, entry[1])
+        return entry[1]
+
+    def __contains__(self, key: str) -> bool:
+        """Return if an entry is in the cache and has not expired."""
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        """Return the number of entries that have not expired."""
+        self._expire()
+        return len(self._entries)
@@ -0,0 +1,104 @@
+"""COMPRESS=DEFLATE (RFC 4978) support for IMAP connections."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+import zlib
+
+from aioimaplib import IMAP4, AioImapException, Command
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPABILITY_COMPRESS_DEFLATE = "COMPRESS=DEFLATE"
+
+
+class DeflateTransport:
+    """Transport wrapper that compresses and decompresses all IMAP traffic.
+
+    The wrapper replaces the transport of the aioimaplib protocol, so every
+    command that is written is compressed. Received data is decompressed
+    before it is handed to the protocol.
+    """
+
+    def __init__(self, transport: asyncio.Transport, protocol: asyncio.Protocol) -> None:
+        """Initialize the compressed transport."""
+        self._transport = transport
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        self._data_received = protocol.data_received
+        self.bytes_sent = 0
+        self.bytes_sent_compressed = 0
+        self.bytes_received = 0
+        self.bytes_received_compressed = 0
+
+    def write(self, data: bytes) -> None:
+        """Compress and write data."""
+        compressed = self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+        self.bytes_sent += len(data)
+        self.bytes_sent_compressed += len(compressed)
+        self._transport.write(compressed)
+
+    def data_received(self, data: bytes) -> None:
+        """Decompress received data and pass it to the protocol."""
+        decompressed = self._decompressor.decompress(data)
+        self.bytes_received += len(decompressed)
+        self.bytes_received_compressed += len(data)
+        if decompressed:
+            self._data_received(decompressed)
+
+    def __getattr__(self, name: str) -> Any:
+        """Pass everything else to the wrapped transport."""
+        return getattr(self._transport, name)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the compression statistics."""
+        return {
+            "bytes_sent": self.bytes_sent,
+            "bytes_sent_compressed": self.bytes_sent_compressed,
+            "bytes_received": self.bytes_received,
+            "bytes_received_compressed": self.bytes_received_compressed,
+            "ratio": round(
+                (self.bytes_sent + self.bytes_received)
+                / max(self.bytes_sent_compressed + self.bytes_received_compressed, 1),
+                2,
+            ),
+        }
+
+
+async def async_enable_compression(client: IMAP4) -> bool:
+    """Negotiate COMPRESS=DEFLATE if the server supports it."""
+    if not client.has_capability(CAPABILITY_COMPRESS_DEFLATE):
+        return False
+    protocol = client.protocol
+    try:
+        response = await asyncio.wait_for(
+            protocol.execute(
+                Command("COMPRESS", protocol.new_tag(), "DEFLATE", loop=protocol.loop)
+            ),
+            client.timeout,
+        )
+    except AioImapException as exc:
+        _LOGGER.debug("Enabling compression failed: %s", exc)
+        return False
+    if response.result != "OK":
+        _LOGGER.debug("Server refused compression: %s", response.lines)
+        return False
+    # The server compresses everything after the tagged response
+    transport = DeflateTransport(protocol.transport, protocol)
+    protocol.data_received = transport.data_received
+    protocol.transport = transport
+    return True
+
+
+def get_compression_stats(client: IMAP4 | None) -> dict[str, Any] | None:
+    """Return the compression statistics of a connection."""
+    if client is None or not isinstance(
+        transport := client.protocol.transport, DeflateTransport
+    ):
+        return None
+    return transport.stats
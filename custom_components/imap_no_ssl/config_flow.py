@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from collections.abc import Mapping
+import re
 import ssl
 from typing import Any
 
@@ -32,22 +33,45 @@ from homeassistant.util.ssl import SSLCipherList
 from .const import (
     CONF_CHARSET,
     CONF_CUSTOM_EVENT_DATA_TEMPLATE,
+    CONF_DUPLICATE_MODE,
+    CONF_ENABLE_COMPRESSION,
+    CONF_ENABLE_INDEX,
+    CONF_ENABLE_STATUS_SENSORS,
+    CONF_ENABLE_TRACING,
+    CONF_EXTRA_SEARCHES,
     CONF_ENABLE_PUSH,
+    CONF_EVENT_HEADERS,
     CONF_EVENT_MESSAGE_DATA,
+    CONF_EVENT_MODE,
+    CONF_FILTER_HEADERS,
+    CONF_FILTER_MAX_SIZE,
+    CONF_FILTER_SENDERS,
+    CONF_FILTER_SUBJECT,
     CONF_FOLDER,
+    CONF_MAX_FETCH_SIZE,
     CONF_MAX_MESSAGE_SIZE,
+    CONF_MAX_SESSIONS,
+    CONF_QUEUE_TIMEOUT,
     CONF_SEARCH,
     CONF_SERVER,
     CONF_SSL_CIPHER_LIST,
     CONF_USE_SSL,
+    DEFAULT_MAX_FETCH_SIZE,
     DEFAULT_MAX_MESSAGE_SIZE,
     DEFAULT_PORT,
     DOMAIN,
+    DUPLICATE_MODE_OFF,
+    DUPLICATE_MODES,
+    EVENT_HEADER_OPTIONS,
+    EVENT_MODE_FULL,
+    EVENT_MODES,
+    HEADER_NAME_RE,
     MAX_MESSAGE_SIZE_LIMIT,
     MESSAGE_DATA_OPTIONS,
 )
-from .coordinator import connect_to_server
+from .coordinator import connect_to_server, parse_extra_searches
 from .errors import InvalidAuth, InvalidFolder
+from .scheduler import DEFAULT_MAX_SESSIONS, DEFAULT_QUEUE_TIMEOUT, MAX_SESSIONS_LIMIT
 
 BOOLEAN_SELECTOR = BooleanSelector()
 CIPHER_SELECTOR = SelectSelector(
@@ -65,6 +89,32 @@ EVENT_MESSAGE_DATA_SELECTOR = SelectSelector(
         multiple=True,
     )
 )
+EVENT_MODE_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=EVENT_MODES,
+        translation_key=CONF_EVENT_MODE,
+    )
+)
+DUPLICATE_MODE_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=DUPLICATE_MODES,
+        translation_key=CONF_DUPLICATE_MODE,
+    )
+)
+FILTER_LIST_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=[],
+        multiple=True,
+        custom_value=True,
+    )
+)
+EVENT_HEADERS_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=EVENT_HEADER_OPTIONS,
+        multiple=True,
+        custom_value=True,
+    )
+)
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -105,7 +155,30 @@ OPTIONS_SCHEMA_ADVANCED = {
         cv.positive_int,
         vol.Range(min=DEFAULT_MAX_MESSAGE_SIZE, max=MAX_MESSAGE_SIZE_LIMIT),
     ),
+    vol.Optional(CONF_MAX_FETCH_SIZE, default=DEFAULT_MAX_FETCH_SIZE): vol.All(
+        cv.positive_int, vol.Range(min=MAX_MESSAGE_SIZE_LIMIT)
+    ),
     vol.Optional(CONF_ENABLE_PUSH, default=True): BOOLEAN_SELECTOR,
+    vol.Optional(CONF_ENABLE_COMPRESSION, default=True): BOOLEAN_SELECTOR,
+    vol.Optional(CONF_ENABLE_STATUS_SENSORS, default=False): BOOLEAN_SELECTOR,
+    vol.Optional(CONF_EXTRA_SEARCHES, default=[]): FILTER_LIST_SELECTOR,
+    vol.Optional(CONF_ENABLE_INDEX, default=False): BOOLEAN_SELECTOR,
+    vol.Optional(CONF_MAX_SESSIONS, default=DEFAULT_MAX_SESSIONS): vol.All(
+        cv.positive_int, vol.Range(min=1, max=MAX_SESSIONS_LIMIT)
+    ),
+    vol.Optional(CONF_QUEUE_TIMEOUT, default=DEFAULT_QUEUE_TIMEOUT): vol.All(
+        cv.positive_int, vol.Range(min=1)
+    ),
+    vol.Optional(CONF_EVENT_MODE, default=EVENT_MODE_FULL): EVENT_MODE_SELECTOR,
+    vol.Optional(
+        CONF_DUPLICATE_MODE, default=DUPLICATE_MODE_OFF
+    ): DUPLICATE_MODE_SELECTOR,
+    vol.Optional(CONF_ENABLE_TRACING, default=False): BOOLEAN_SELECTOR,
+    vol.Optional(CONF_EVENT_HEADERS, default=[]): EVENT_HEADERS_SELECTOR,
+    vol.Optional(CONF_FILTER_SENDERS, default=[]): FILTER_LIST_SELECTOR,
+    vol.Optional(CONF_FILTER_SUBJECT, default=""): str,
+    vol.Optional(CONF_FILTER_HEADERS, default=[]): FILTER_LIST_SELECTOR,
+    vol.Optional(CONF_FILTER_MAX_SIZE, default=0): cv.positive_int,
 }
 
 
@@ -115,12 +188,35 @@ async def validate_input(
     """Validate user input."""
     errors = {}
 
+    for header_key in (CONF_EVENT_HEADERS, CONF_FILTER_HEADERS):
+        if not all(
+            HEADER_NAME_RE.match(header) for header in user_input.get(header_key, [])
+        ):
+            errors[header_key] = "invalid_header"
+    if subject_filter := user_input.get(CONF_FILTER_SUBJECT):
+        try:
+            re.compile(subject_filter)
+        except re.error:
+            errors[CONF_FILTER_SUBJECT] = "invalid_regex"
+    extra_searches = parse_extra_searches(user_input.get(CONF_EXTRA_SEARCHES, []))
+    if extra_searches is None:
+        errors[CONF_EXTRA_SEARCHES] = "invalid_extra_search"
+    if errors:
+        return errors
+
     try:
         imap_client = await connect_to_server(user_input)
         result, lines = await imap_client.search(
             user_input[CONF_SEARCH],
             charset=user_input[CONF_CHARSET],
         )
+        extra_search_results = [
+            (
+                await imap_client.search(criteria, charset=user_input[CONF_CHARSET])
+            ).result
+            == "OK"
+            for criteria in extra_searches.values()
+        ]
 
     except InvalidAuth:
         errors[CONF_USERNAME] = errors[CONF_PASSWORD] = "invalid_auth"
@@ -139,6 +235,8 @@ async def validate_input(
                 errors[CONF_CHARSET] = "invalid_charset"
             else:
                 errors[CONF_SEARCH] = "invalid_search"
+        if not all(extra_search_results):
+            errors[CONF_EXTRA_SEARCHES] = "invalid_search"
 
     return errors
 
@@ -1,5 +1,6 @@
 """Constants for the imap integration."""
 
+import re
 from typing import Final
 
 DOMAIN: Final = "imap_no_ssl"
@@ -14,11 +15,56 @@ CONF_CUSTOM_EVENT_DATA_TEMPLATE: Final = "custom_event_data_template"
 CONF_SSL_CIPHER_LIST: Final = "ssl_cipher_list"
 CONF_ENABLE_PUSH: Final = "enable_push"
 CONF_USE_SSL: Final = "use_ssl"
+CONF_ENABLE_COMPRESSION: Final = "enable_compression"
+CONF_EVENT_HEADERS: Final = "event_headers"
+CONF_FILTER_SENDERS: Final = "filter_senders"
+CONF_FILTER_SUBJECT: Final = "filter_subject"
+CONF_FILTER_HEADERS: Final = "filter_headers"
+CONF_FILTER_MAX_SIZE: Final = "filter_max_size"
+CONF_ENABLE_STATUS_SENSORS: Final = "enable_status_sensors"
+CONF_EXTRA_SEARCHES: Final = "extra_searches"
+CONF_ENABLE_INDEX: Final = "enable_index"
+CONF_MAX_SESSIONS: Final = "max_sessions"
+CONF_QUEUE_TIMEOUT: Final = "queue_timeout"
+CONF_MAX_FETCH_SIZE: Final = "max_fetch_size"
+CONF_EVENT_MODE: Final = "event_mode"
+CONF_ENABLE_TRACING: Final = "enable_tracing"
+CONF_DUPLICATE_MODE: Final = "duplicate_mode"
 
 DEFAULT_PORT: Final = 993
 
 DEFAULT_MAX_MESSAGE_SIZE = 2048
 
+DEFAULT_MAX_FETCH_SIZE = 1048576
+
 MESSAGE_DATA_OPTIONS: Final = ["text", "headers"]
 
+EVENT_MODE_FULL: Final = "full"
+EVENT_MODE_REFERENCE: Final = "reference"
+EVENT_MODES: Final = [EVENT_MODE_FULL, EVENT_MODE_REFERENCE]
+
+DUPLICATE_MODE_OFF: Final = "off"
+DUPLICATE_MODE_SUPPRESS: Final = "suppress"
+DUPLICATE_MODE_TAG: Final = "tag"
+DUPLICATE_MODES: Final = [
+    DUPLICATE_MODE_OFF,
+    DUPLICATE_MODE_SUPPRESS,
+    DUPLICATE_MODE_TAG,
+]
+
+EVENT_HEADER_OPTIONS: Final = [
+    "From",
+    "To",
+    "Cc",
+    "Reply-To",
+    "Subject",
+    "Date",
+    "Message-ID",
+    "List-Id",
+]
+
+# Header field names (RFC 5322) that are IMAP atoms, so they can be sent
+# unquoted in HEADER.FIELDS: printable characters except `:` and `"%()*\]{`
+HEADER_NAME_RE: Final = re.compile(r"^[!#$&'+,\-./0-9;-Z\[^-z|}~]+$")
+
 MAX_MESSAGE_SIZE_LIMIT: Final = 30000
@@ -3,17 +3,30 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Mapping
+from collections.abc import Iterable, Iterator, Mapping
 from datetime import datetime, timedelta
+from functools import partial
 import email
 from email.header import decode_header, make_header
 from email.message import Message
 from email.utils import parseaddr, parsedate_to_datetime
 import logging, base64
-from typing import TYPE_CHECKING, Any
+from typing import Any
 import re
-
-from aioimaplib import AUTH, IMAP4_SSL, IMAP4, NONAUTH, SELECTED, AioImapException
+import sqlite3
+import time
+from uuid import uuid4
+from weakref import WeakKeyDictionary
+
+from aioimaplib import (
+    AUTH,
+    IMAP4_SSL,
+    IMAP4,
+    NONAUTH,
+    SELECTED,
+    AioImapException,
+    Command,
+)
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
@@ -23,60 +36,180 @@ from homeassistant.const import (
     CONF_VERIFY_SSL,
     CONTENT_TYPE_TEXT_PLAIN,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import (
     ConfigEntryAuthFailed,
     ConfigEntryError,
     TemplateError,
 )
 from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 from homeassistant.helpers.template import Template
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util import dt as dt_util
-from homeassistant.util.ssl import (
-    SSLCipherList,
-    client_context,
-    create_no_verify_ssl_context,
-)
+from homeassistant.util.ssl import SSLCipherList
 
 from .const import (
     CONF_CHARSET,
     CONF_CUSTOM_EVENT_DATA_TEMPLATE,
+    CONF_DUPLICATE_MODE,
+    CONF_ENABLE_COMPRESSION,
+    CONF_ENABLE_INDEX,
+    CONF_ENABLE_STATUS_SENSORS,
+    CONF_ENABLE_TRACING,
+    CONF_EVENT_HEADERS,
     CONF_EVENT_MESSAGE_DATA,
+    CONF_EVENT_MODE,
+    CONF_EXTRA_SEARCHES,
     CONF_FOLDER,
+    CONF_MAX_FETCH_SIZE,
     CONF_MAX_MESSAGE_SIZE,
+    CONF_MAX_SESSIONS,
+    CONF_QUEUE_TIMEOUT,
     CONF_SEARCH,
     CONF_SERVER,
     CONF_SSL_CIPHER_LIST,
     CONF_USE_SSL,
+    DEFAULT_MAX_FETCH_SIZE,
     DEFAULT_MAX_MESSAGE_SIZE,
     DOMAIN,
+    DUPLICATE_MODE_OFF,
+    DUPLICATE_MODE_SUPPRESS,
+    DUPLICATE_MODE_TAG,
+    EVENT_MODE_FULL,
+    EVENT_MODE_REFERENCE,
+    HEADER_NAME_RE,
     MESSAGE_DATA_OPTIONS,
 )
+from .auth import async_authenticate, use_greeting_capabilities
+from .cache import TTLCache
+from .compression import async_enable_compression, get_compression_stats
 from .errors import InvalidAuth, InvalidFolder
+from .index import MessageIndex
+from .rules import MessageRules
+from .scheduler import (
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_QUEUE_TIMEOUT,
+    SessionScheduler,
+)
+from .streaming import STREAMING_SUPPORTED, async_fetch_message_streaming
+from .text import extract_html_text, extract_text
+from .tls import (
+    ResumableSSLContext,
+    async_get_ssl_context,
+    get_tls_stats,
+    record_tls_session,
+)
+from .tracing import Tracer
 
 _LOGGER = logging.getLogger(__name__)
 
 BACKOFF_TIME = 10
+POLLING_INTERVAL = timedelta(seconds=3600)
 
 EVENT_IMAP = "imap_content"
 MAX_ERRORS = 3
 MAX_EVENT_DATA_BYTES = 32168
+MAX_CATCH_UP_EVENTS = 20
+
+# New messages waiting for the consumer of a push entry
+PUSH_QUEUE_SIZE = 100
+
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 10
+
+UIDVALIDITY_RE = re.compile(rb"UIDVALIDITY (\d+)")
+# UIDVALIDITY of the selected folder of each client, taken from SELECT
+_SELECTED_UIDVALIDITY: WeakKeyDictionary[IMAP4, int] = WeakKeyDictionary()
+STATUS_ITEM_RE = re.compile(
+    rb"\b(MESSAGES|UNSEEN|RECENT|UIDNEXT|HIGHESTMODSEQ|SIZE) (\d+)"
+)
+# Folder status items of the status sensors
+STATUS_SENSOR_ITEMS = ("messages", "unseen", "recent", "uidnext", "size")
+ESEARCH_COUNT_RE = re.compile(rb'\(TAG "?([^")]+)"?\).*?\bCOUNT (\d+)', re.IGNORECASE)
+INDEX_SYNC_CHUNK_SIZE = 500
+# Seconds between flag syncs of all messages if the server lacks CONDSTORE
+INDEX_FLAG_SYNC_INTERVAL = 900
+# Bytes of the text part fetched per character of the event text, as encoded
+# and HTML text needs more bytes than the text it contains
+PARTIAL_TEXT_FACTOR = 8
+# Bytes allowed for the boundary and headers of the first part of a message
+MIME_PART_HEADER_SIZE = 2048
+QUOTA_STORAGE_RE = re.compile(rb"\bSTORAGE (\d+) (\d+)", re.IGNORECASE)
+
+# Event fields that may be shrunk to fit the event size, in priority order
+EVENT_TRUNCATE_ORDER = ("headers", "text", "custom", "subject")
+
+# Headers that are always fetched with a header whitelist
+EVENT_HEADER_FIELDS = (
+    "From",
+    "Subject",
+    "Date",
+    "Message-ID",
+    "MIME-Version",
+    "Content-Type",
+    "Content-Transfer-Encoding",
+)
+
+# Event fields that are sent in reference mode, the rest is cached
+REFERENCE_EVENT_FIELDS = (
+    "entry_id",
+    "server",
+    "username",
+    "search",
+    "folder",
+    "initial",
+    "date",
+    "sender",
+    "subject",
+    "uid",
+    "size",
+    "duplicate",
+)
+EVENT_PAYLOAD_CACHE_SIZE = 100
+EVENT_PAYLOAD_TTL = 300
+
+# Sorted UIDs of the search service, kept to return the next pages
+SORT_RESULT_CACHE_SIZE = 10
+SORT_RESULT_TTL = 600
+
+# Message-IDs processed by all entries, to detect the same message in several
+DATA_PROCESSED_MESSAGE_IDS = f"{DOMAIN}_processed_message_ids"
+PROCESSED_MESSAGE_IDS_SIZE = 1000
+PROCESSED_MESSAGE_IDS_TTL = 86400
 
-DIAGNOSTICS_ATTRIBUTES = ["date", "initial"]
+DIAGNOSTICS_ATTRIBUTES = ["date", "initial", "truncated"]
+
+
+def parse_extra_searches(values: Iterable[str]) -> dict[str, str] | None:
+    """Parse named searches in the `name: criteria` format.
+
+    Returns `None` if a search is not in the expected format.
+    """
+    searches: dict[str, str] = {}
+    for value in values:
+        name, _, criteria = value.partition(":")
+        if not (name := name.strip()) or not (criteria := criteria.strip()):
+            return None
+        searches[name] = criteria
+    return searches
 
 
 async def connect_to_server(data: Mapping[str, Any], timeout=10) -> IMAP4:
     """Connect to imap server and return client."""
+    ssl_context: ResumableSSLContext | None = None
     if data.get(CONF_USE_SSL, False):
-        ssl_cipher_list: str = data.get(CONF_SSL_CIPHER_LIST, SSLCipherList.PYTHON_DEFAULT)
-        if data.get(CONF_VERIFY_SSL, True):
-            ssl_context = client_context(ssl_cipher_list=SSLCipherList(ssl_cipher_list))
-        else:
-            ssl_context = create_no_verify_ssl_context()
+        ssl_context = await async_get_ssl_context(
+            data[CONF_SERVER],
+            data[CONF_PORT],
+            data.get(CONF_VERIFY_SSL, True),
+            data.get(CONF_SSL_CIPHER_LIST, SSLCipherList.PYTHON_DEFAULT),
+        )
         client = IMAP4_SSL(data[CONF_SERVER], data[CONF_PORT], ssl_context=ssl_context, timeout=timeout)
     else:
         client = IMAP4(data[CONF_SERVER], data[CONF_PORT], timeout=timeout)
+    use_greeting_capabilities(client)
+    connect_start = time.monotonic()
     _LOGGER.debug(
         "Wait for hello message from server %s on port %s, verify_ssl: %s",
         data[CONF_SERVER],
@@ -84,141 +217,341 @@ async def connect_to_server(data: Mapping[str, Any], timeout=10) -> IMAP4:
         data.get(CONF_VERIFY_SSL, True),
     )
     await client.wait_hello_from_server()
+    if ssl_context is not None:
+        record_tls_session(client, ssl_context, time.monotonic() - connect_start)
     if client.protocol.state == NONAUTH:
         _LOGGER.debug(
             "Authenticating with %s on server %s",
             data[CONF_USERNAME],
             data[CONF_SERVER],
         )
-        await client.login(data[CONF_USERNAME], data[CONF_PASSWORD])
+        await async_authenticate(client, data[CONF_USERNAME], data[CONF_PASSWORD])
     if client.protocol.state not in {AUTH, SELECTED}:
         raise InvalidAuth("Invalid username or password")
+    if client.protocol.state == AUTH and data.get(CONF_ENABLE_COMPRESSION, True):
+        if await async_enable_compression(client):
+            _LOGGER.debug("Enabled compression on server %s", data[CONF_SERVER])
     if client.protocol.state == AUTH:
         _LOGGER.debug(
             "Selecting mail folder %s on server %s",
             data[CONF_FOLDER],
             data[CONF_SERVER],
         )
-        await client.select(data[CONF_FOLDER])
+        response = await client.select(data[CONF_FOLDER])
+        if match := UIDVALIDITY_RE.search(b" ".join(map(bytes, response.lines))):
+            _SELECTED_UIDVALIDITY[client] = int(match.group(1))
     if client.protocol.state != SELECTED:
         raise InvalidFolder(f"Folder {data[CONF_FOLDER]} is invalid")
     return client
 
-class ImapParts:
-    SUBTYPES = ['MIXED', 'MESSAGE', 'DIGEST', 'ALTERNATIVE', 'RELATED',
-        'REPORT','SIGNED','ENCRYPTED','FORM DATA']
-    BODYSTRUCTURE_RE = re.compile('.*\(BODY\w{0,9} (.*)\)')
-    CONTENT_TYPE_RE = re.compile(r'\s*"(TEXT|APPLICATION|IMAGE|VIDEO|AUDIO)"', re.I)
-    CONTENT_SUBTYPE_RE = re.compile(r'\s*"(?:TEXT|APPLICATION|IMAGE|VIDEO|AUDIO)" "(.+?)"', re.I)
-    MULTIPART_TYPE_RE = re.compile('\s*"({0})"'.format('|'.join(SUBTYPES)), re.I)
-    MULTIPART_SUBTYPE_RE = re.compile('\s*"(?:{0})" "(.+?)"'.format('|'.join(SUBTYPES)), re.I)
-
-    def __init__(self, content_type, depth, content=None):
-        self.content_type = content_type
-        self.depth = depth
-        self.content = content
-        self.parts = []
-
-    def add_child(self, child):
-        self.parts.append(child)
-
-    def get_child(self, index):
-        try:
-            return self.parts[index]
-        except IndexError:
-            return None
-    
-    def print_tree(self, index=''):
-        if self.depth != 0:
-            print("not main")
-            return
-        yield from self._print_tree(index)
-    
-    def _print_tree(self, index=''):
-        i = 0
-        pp = index + " " + self.content_type
-        yield pp.strip()
-        if index:
-            index += '.'
-        for part in self.parts:
-            i += 1
-            yield from part._print_tree(index + str(i))
-
-    def __str__(self):
-        if self.content:
-            return self.content_type + " : " + str(self.parts) + " : " + self.content
-        return self.content_type + " : " + str(self.parts)
-    
-    @staticmethod
-    def get_parts(txt):
-        txt = ImapParts.BODYSTRUCTURE_RE.findall(txt)[0]
-        s = []
-        parts = []
-        for i in range(len(txt)):
-            c = txt[i]
-            if c == '(':
-                s.append(i)
-            elif c == ')':
-                d = len(s) - 1
-                multires = ImapParts.MULTIPART_TYPE_RE.findall(txt[s[-1]:i+1])
-                if multires:
-                    try:
-                        t = multires[-1] + "/" + ImapParts.MULTIPART_SUBTYPE_RE.findall(txt[s[-1]:i+1])[-1]
-                    except IndexError:
-                        t = multires[-1]
-                    parts.append(ImapParts(t, d))
-                else:
-                    contentres = ImapParts.CONTENT_TYPE_RE.findall(txt[s[-1]:i+1])
-                    if contentres:
-                        t = contentres[-1] + "/" + ImapParts.CONTENT_SUBTYPE_RE.findall(txt[s[-1]:i+1])[-1]
-                        parts.append(ImapParts(t, d, content=txt[s[-1]:i+1]))
-                s.pop(-1)
-
-        d = 0
-        for i in range(len(parts)):
-            if i == len(parts)-1:
-                continue
 
-            d = parts[i].depth
-            j = i + 1
-            while parts[j].depth >= parts[i].depth:
-                j += 1
-            parts[j].add_child(parts[i])
+def get_selected_uidvalidity(client: IMAP4) -> int | None:
+    """Return the UIDVALIDITY the server sent when the folder was selected."""
+    return _SELECTED_UIDVALIDITY.get(client)
+
+
+_OPEN = object()
+_CLOSE = object()
+_LITERAL = object()
+LITERAL_RE = re.compile(rb"\{(\d+)\+?\}\s*$")
+
+
+def _tokenize_fetch_line(line: bytes) -> list[Any]:
+    """Split a line of a FETCH response into tokens."""
+    tokens: list[Any] = []
+    pos = 0
+    length = len(line)
+    while pos < length:
+        char = line[pos : pos + 1]
+        if char in b" \t\r\n":
+            pos += 1
+        elif char == b"(":
+            tokens.append(_OPEN)
+            pos += 1
+        elif char == b")":
+            tokens.append(_CLOSE)
+            pos += 1
+        elif char == b'"':
+            pos += 1
+            value = bytearray()
+            while pos < length and line[pos : pos + 1] != b'"':
+                if line[pos : pos + 1] == b"\\":
+                    pos += 1
+                value += line[pos : pos + 1]
+                pos += 1
+            tokens.append(value.decode("utf-8", errors="replace"))
+            pos += 1
+        elif char == b"{" and LITERAL_RE.match(line, pos):
+            tokens.append(_LITERAL)
+            break
+        else:
+            start = pos
+            while pos < length and line[pos : pos + 1] not in b" ()":
+                if line[pos : pos + 1] == b"[":
+                    # Section specs like BODY[HEADER.FIELDS (FROM)] contain spaces
+                    end = line.find(b"]", pos)
+                    pos = length if end == -1 else end
+                pos += 1
+            atom = line[start:pos].decode("utf-8", errors="replace")
+            if atom.upper() == "NIL":
+                tokens.append(None)
+            elif atom.isdigit():
+                tokens.append(int(atom))
+            else:
+                tokens.append(atom)
+    return tokens
+
+
+def _build_fetch_lists(tokens: list[Any]) -> list[Any]:
+    """Nest the FETCH response tokens on their parentheses."""
+    root: list[Any] = []
+    stack: list[list[Any]] = [root]
+    for token in tokens:
+        if token is _OPEN:
+            child: list[Any] = []
+            stack[-1].append(child)
+            stack.append(child)
+        elif token is _CLOSE:
+            if len(stack) > 1:
+                stack.pop()
+        else:
+            stack[-1].append(token)
+    return root
+
+
+def parse_fetch_response(lines: list[bytes]) -> list[dict[str, Any]]:
+    """Parse the lines of a FETCH response into a dict per message.
+
+    The data items are keyed by their upper case name, literals are
+    returned as bytes. The message sequence number is stored as `SEQ`.
+    """
+    tokens: list[Any] = []
+    expect_literal = False
+    # The last line is the text of the tagged response
+    for line in lines[:-1]:
+        if expect_literal:
+            tokens.append(bytes(line))
+            expect_literal = False
+            continue
+        line_tokens = _tokenize_fetch_line(bytes(line).removeprefix(b"* "))
+        if line_tokens and line_tokens[-1] is _LITERAL:
+            line_tokens.pop()
+            expect_literal = True
+        tokens.extend(line_tokens)
+
+    messages: list[dict[str, Any]] = []
+    values = _build_fetch_lists(tokens)
+    for index in range(len(values) - 2):
+        if (
+            isinstance(values[index], int)
+            and isinstance(values[index + 1], str)
+            and values[index + 1].upper() == "FETCH"
+            and isinstance(values[index + 2], list)
+        ):
+            items: list[Any] = values[index + 2]
+            message: dict[str, Any] = {"SEQ": values[index]}
+            for key, value in zip(items[::2], items[1::2]):
+                message[str(key).upper()] = value
+            messages.append(message)
+    return messages
+
+
+def fetch_item(message: Mapping[str, Any], name: str) -> Any:
+    """Return a FETCH data item by its name or section prefix."""
+    name = name.upper()
+    if name in message:
+        return message[name]
+    for key, value in message.items():
+        if key.startswith(name):
+            return value
+    return None
+
+
+def find_fetched_message(
+    messages: Iterable[dict[str, Any]], message_uid: str | int
+) -> dict[str, Any] | None:
+    """Return the FETCH data of a message by its UID.
+
+    The response of a command can include unsolicited FETCH responses of
+    other messages, like flag changes.
+    """
+    uid = int(message_uid)
+    return next((message for message in messages if message.get("UID") == uid), None)
+
+
+def _as_str(value: Any) -> str | None:
+    """Return a FETCH string value as str."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _as_params(value: Any) -> dict[str, str]:
+    """Return a BODYSTRUCTURE parameter list as a dict."""
+    if not isinstance(value, list):
+        return {}
+    return {
+        str(_as_str(key)).lower(): str(_as_str(param))
+        for key, param in zip(value[::2], value[1::2])
+    }
+
+
+def parse_bodystructure(structure: list[Any], part_number: str = "") -> dict[str, Any]:
+    """Convert a parsed BODYSTRUCTURE into a tree of parts.
+
+    Every part has the section number that can be used to fetch it.
+    """
+    if structure and isinstance(structure[0], list):
+        children: list[dict[str, Any]] = []
+        index = 0
+        while index < len(structure) and isinstance(structure[index], list):
+            child_number = f"{part_number}.{index + 1}" if part_number else str(index + 1)
+            children.append(parse_bodystructure(structure[index], child_number))
+            index += 1
+        subtype = _as_str(structure[index]) if index < len(structure) else "mixed"
+        return {
+            "part": part_number,
+            "content_type": f"multipart/{subtype}".lower(),
+            "parts": children,
+        }
+
+    structure = structure + [None] * (7 - len(structure))
+    content_type = f"{_as_str(structure[0])}/{_as_str(structure[1])}".lower()
+    params = _as_params(structure[2])
+    # Text parts have a line count, message parts an envelope, body and line count
+    extension_index = 7
+    if content_type.startswith("text/"):
+        extension_index = 8
+    elif content_type == "message/rfc822":
+        extension_index = 10
+    disposition: dict[str, str] = {}
+    if len(structure) > extension_index + 1 and isinstance(
+        disposition_data := structure[extension_index + 1], list
+    ):
+        disposition = _as_params(disposition_data[1] if len(disposition_data) > 1 else None)
+        disposition["type"] = str(_as_str(disposition_data[0])).lower()
+    return {
+        "part": part_number or "1",
+        "content_type": content_type,
+        "charset": params.get("charset"),
+        "encoding": str(_as_str(structure[5]) or "7bit").lower(),
+        "size": structure[6] if isinstance(structure[6], int) else 0,
+        "filename": disposition.get("filename") or params.get("name"),
+        "disposition": disposition.get("type"),
+    }
+
+
+def iter_body_parts(part: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """Iterate over the leaf parts of a BODYSTRUCTURE tree."""
+    if "parts" not in part:
+        yield part
+        return
+    for child in part["parts"]:
+        yield from iter_body_parts(child)
+
+
+def _decode_words(value: Any) -> str | None:
+    """Decode an RFC 2047 encoded FETCH string."""
+    if (text := _as_str(value)) is None:
+        return None
+    try:
+        return str(make_header(decode_header(text)))
+    except (LookupError, ValueError):
+        return text
+
+
+def _parse_addresses(addresses: Any) -> list[dict[str, str | None]]:
+    """Parse an ENVELOPE address list."""
+    if not isinstance(addresses, list):
+        return []
+    result: list[dict[str, str | None]] = []
+    for address in addresses:
+        if not isinstance(address, list) or len(address) < 4:
+            continue
+        mailbox, host = _as_str(address[2]), _as_str(address[3])
+        if mailbox is None or host is None:
+            # Start or end of an address group
+            continue
+        result.append({"name": _decode_words(address[0]), "email": f"{mailbox}@{host}"})
+    return result
+
+
+def parse_envelope(envelope: Any) -> dict[str, Any]:
+    """Convert a parsed ENVELOPE into a dict."""
+    if not isinstance(envelope, list) or len(envelope) < 10:
+        return {}
+    return {
+        "date": _as_str(envelope[0]),
+        "subject": _decode_words(envelope[1]),
+        "from": _parse_addresses(envelope[2]),
+        "sender": _parse_addresses(envelope[3]),
+        "reply_to": _parse_addresses(envelope[4]),
+        "to": _parse_addresses(envelope[5]),
+        "cc": _parse_addresses(envelope[6]),
+        "bcc": _parse_addresses(envelope[7]),
+        "in_reply_to": _as_str(envelope[8]),
+        "message_id": _as_str(envelope[9]),
+    }
+
+
+def find_text_part(structure: dict[str, Any]) -> dict[str, Any] | None:
+    """Find the part with the message text in a BODYSTRUCTURE tree.
+
+    Will look for text/plain or use text/html if not found.
+    """
+    text_parts = [
+        part
+        for part in iter_body_parts(structure)
+        if part["content_type"].startswith("text/")
+        and part["disposition"] != "attachment"
+    ]
+    for content_type in (CONTENT_TYPE_TEXT_PLAIN, "text/html"):
+        for part in text_parts:
+            if part["content_type"] == content_type:
+                return part
+    return text_parts[0] if text_parts else None
 
-        return parts[-1]
 
 class ImapMessage:
     """Class to parse an RFC822 email message."""
 
-    def __init__(self, raw_message: bytes) -> None:
-        """Initialize IMAP message."""
-        self.email_message = email.message_from_bytes(raw_message)
-
-    def set_content(self, content):
-        self.email_message.set_payload(content)
-
-    @staticmethod
-    def _decode_payload(part: Message) -> str:
-        """Try to decode text payloads.
-
-        Common text encodings are quoted-printable or base64.
-        Falls back to the raw content part if decoding fails.
-        """
-        try:
-            decoded_payload: Any = part.get_payload(decode=True)
-            if TYPE_CHECKING:
-                assert isinstance(decoded_payload, bytes)
-            content_charset = part.get_content_charset() or "utf-8"
-            return decoded_payload.decode(content_charset)
-        except ValueError:
-            # return undecoded payload
-            return str(part.get_payload())
+    def __init__(
+        self, raw_message: bytes | Message, size: int | None = None
+    ) -> None:
+        """Initialize IMAP message, `size` is the size on the server."""
+        if isinstance(raw_message, Message):
+            self.email_message = raw_message
+        else:
+            self.email_message = email.message_from_bytes(raw_message)
+        self.size = size
+
+    def set_text_part(self, content: bytes, part: Mapping[str, Any]) -> None:
+        """Replace the body of the message with a single fetched part."""
+        del self.email_message["Content-Type"]
+        del self.email_message["Content-Transfer-Encoding"]
+        content_type: str = part["content_type"]
+        if part.get("charset"):
+            content_type += f'; charset="{part["charset"]}"'
+        self.email_message["Content-Type"] = content_type
+        self.email_message["Content-Transfer-Encoding"] = part["encoding"]
+        self.email_message.set_payload(bytes(content).decode("ascii", "surrogateescape"))
 
     @property
     def headers(self) -> dict[str, tuple[str, ...]]:
         """Get the email headers."""
+        return self.get_headers()
+
+    def get_headers(
+        self, names: Iterable[str] | None = None
+    ) -> dict[str, tuple[str, ...]]:
+        """Get the email headers, limited to `names` if set."""
+        wanted = {name.lower() for name in names} if names else None
         header_base: dict[str, tuple[str, ...]] = {}
         for key, value in self.email_message.items():
+            if wanted is not None and key.lower() not in wanted:
+                continue
             header_instances: tuple[str, ...] = (str(value),)
             if header_base.setdefault(key, header_instances) != header_instances:
                 header_base[key] += header_instances
@@ -263,40 +596,43 @@ class ImapMessage:
 
     @property
     def text(self) -> str:
-        """Get the message text from the email.
+        """Get the message text from the email."""
+        return self.get_text()
+
+    def get_text(self, max_size: int | None = None) -> str:
+        """Get the message text from the email, limited to `max_size` characters.
 
-        Will look for text/plain or use/ text/html if not found.
+        Will look for text/plain or convert text/html if not found.
+        Only as much of the payload is decoded as is needed for the limit.
         """
-        message_text: str | None = None
-        message_html: str | None = None
-        message_untyped_text: str | None = None
+        text_part: Message | None = None
+        html_part: Message | None = None
+        untyped_text_part: Message | None = None
 
         part: Message
         for part in self.email_message.walk():
-            if part.get_content_type() == CONTENT_TYPE_TEXT_PLAIN:
-                if message_text is None:
-                    message_text = self._decode_payload(part)
-            elif part.get_content_type() == "text/html":
-                if message_html is None:
-                    message_html = self._decode_payload(part)
-            elif (
-                part.get_content_type().startswith("text")
-                and message_untyped_text is None
-            ):
-                message_untyped_text = str(part.get_payload())
-            else:
-                message_untyped_text = str(part.get_payload()).replace("=\r\n", "").replace("=3D", "=").replace("= ", "=")
+            if part.is_multipart() or part.get_filename() is not None:
+                continue
+            content_type = part.get_content_type()
+            if content_type == CONTENT_TYPE_TEXT_PLAIN:
+                text_part = text_part or part
+            elif content_type == "text/html":
+                html_part = html_part or part
+            elif content_type.startswith("text/"):
+                untyped_text_part = untyped_text_part or part
 
-        if message_text is not None:
-            return message_text
+        if text_part is not None:
+            return extract_text(text_part, max_size)
 
-        if message_html is not None:
-            return message_html
+        if html_part is not None:
+            return extract_html_text(html_part, max_size)
 
-        if message_untyped_text is not None:
-            return message_untyped_text
+        if untyped_text_part is not None:
+            return extract_text(untyped_text_part, max_size)
 
-        return str(self.email_message.get_payload())
+        if self.email_message.is_multipart():
+            return ""
+        return extract_text(self.email_message, max_size)
 
     @property
     def attachments(self) -> list[dict]:
@@ -315,6 +651,94 @@ class ImapMessage:
         return attachments
 
 
+class EventSizeBudget:
+    """Keep the serialized size of an event within a byte budget.
+
+    The size of every field is estimated when it is set, so the event
+    never has to be serialized as a whole to be measured.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize the budget."""
+        self.limit = limit
+        self._sizes: dict[str, int] = {}
+
+    @staticmethod
+    def _field_size(key: str, value: Any) -> int:
+        """Return the size of a serialized `"key":value,` pair."""
+        return len(json_bytes(key)) + len(json_bytes(value)) + 2
+
+    @property
+    def size(self) -> int:
+        """Return the serialized size of the tracked event."""
+        # The braces of the object replace the last field separator
+        return sum(self._sizes.values()) + 1
+
+    def set(self, data: dict[str, Any], key: str, value: Any) -> None:
+        """Set an event field and track its size."""
+        data[key] = value
+        self._sizes[key] = self._field_size(key, value)
+
+    def update(self, data: dict[str, Any], fields: Mapping[str, Any]) -> None:
+        """Set multiple event fields and track their sizes."""
+        for key, value in fields.items():
+            self.set(data, key, value)
+
+    def _shrink_headers(self, data: dict[str, Any], key: str) -> None:
+        """Drop the largest headers until the event fits."""
+        headers: dict[str, tuple[str, ...]] = dict(data[key])
+        header_sizes = sorted(
+            ((self._field_size(name, value), name) for name, value in headers.items()),
+            reverse=True,
+        )
+        excess = self.size - self.limit
+        for header_size, name in header_sizes:
+            if excess <= 0:
+                break
+            del headers[name]
+            excess -= header_size
+        self.set(data, key, headers)
+
+    def _shrink_text(self, data: dict[str, Any], key: str) -> None:
+        """Truncate a text field until the event fits."""
+        text: str = data[key]
+        # Characters can take several bytes when serialized, so bisect on the
+        # serialized size for the longest prefix that fits
+        budget = self._sizes[key] - (self.size - self.limit)
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._field_size(key, text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        self.set(data, key, text[:low])
+
+    def fit(self, data: dict[str, Any]) -> bool:
+        """Shrink the event fields in priority order until the event fits.
+
+        Returns `True` if the event was truncated.
+        """
+        truncated = False
+        for key in EVENT_TRUNCATE_ORDER:
+            if self.size <= self.limit:
+                break
+            if not data.get(key):
+                continue
+            truncated = True
+            value = data[key]
+            if isinstance(value, dict):
+                self._shrink_headers(data, key)
+            elif isinstance(value, str):
+                self._shrink_text(data, key)
+            else:
+                # Non text template results cannot be cut in a meaningful way
+                self.set(data, key, None)
+        if "truncated" in data:
+            self.set(data, "truncated", truncated)
+        return truncated
+
+
 class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
     """Base class for imap client."""
 
@@ -324,7 +748,7 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
     def __init__(
         self,
         hass: HomeAssistant,
-        imap_client: IMAP4,
+        imap_client: IMAP4 | None,
         entry: ConfigEntry,
         update_interval: timedelta | None,
     ) -> None:
@@ -333,6 +757,13 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
         self.auth_errors: int = 0
         self._last_message_uid: str | None = None
         self._last_message_id: str | None = None
+        self._uidvalidity: int | None = None
+        self._uidvalidity_checked = False
+        self._uid_high_water: int = 0
+        self._catch_up_after: int | None = None
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}"
+        )
         self.custom_event_template = None
         self._diagnostics_data: dict[str, Any] = {}
         self._event_data_keys: list[str] = entry.data.get(
@@ -341,6 +772,49 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
         self._max_event_size: int = entry.data.get(
             CONF_MAX_MESSAGE_SIZE, DEFAULT_MAX_MESSAGE_SIZE
         )
+        self._max_fetch_size: int = entry.data.get(
+            CONF_MAX_FETCH_SIZE, DEFAULT_MAX_FETCH_SIZE
+        )
+        self._event_mode: str = entry.data.get(CONF_EVENT_MODE, EVENT_MODE_FULL)
+        self._duplicate_mode: str = entry.data.get(
+            CONF_DUPLICATE_MODE, DUPLICATE_MODE_OFF
+        )
+        # Shared by all entries
+        self._processed_message_ids: TTLCache[tuple[str, str]] = (
+            hass.data.setdefault(
+                DATA_PROCESSED_MESSAGE_IDS,
+                TTLCache(PROCESSED_MESSAGE_IDS_SIZE, PROCESSED_MESSAGE_IDS_TTL),
+            )
+        )
+        self.event_payloads: TTLCache[dict[str, Any]] = TTLCache(
+            EVENT_PAYLOAD_CACHE_SIZE, EVENT_PAYLOAD_TTL
+        )
+        self.sort_results: TTLCache[list[int]] = TTLCache(
+            SORT_RESULT_CACHE_SIZE, SORT_RESULT_TTL
+        )
+        self._rules = MessageRules.from_entry_data(entry.data)
+        self._status_sensors: bool = entry.data.get(CONF_ENABLE_STATUS_SENSORS, False)
+        self.status_data: dict[str, int | None] = {}
+        self._extra_searches = (
+            parse_extra_searches(entry.data.get(CONF_EXTRA_SEARCHES, [])) or {}
+        )
+        self.search_counts: dict[str, int | None] = {}
+        self.scheduler = SessionScheduler(
+            entry.data.get(CONF_MAX_SESSIONS, DEFAULT_MAX_SESSIONS),
+            entry.data.get(CONF_QUEUE_TIMEOUT, DEFAULT_QUEUE_TIMEOUT),
+        )
+        self.message_index: MessageIndex | None = None
+        self._index_flags_synced: float | None = None
+        if entry.data.get(CONF_ENABLE_INDEX, False):
+            self.message_index = MessageIndex(
+                hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry.entry_id}.db")
+            )
+        self.tracer = Tracer(entry.data.get(CONF_ENABLE_TRACING, False))
+        self._event_headers: list[str] = [
+            header
+            for header in entry.data.get(CONF_EVENT_HEADERS, [])
+            if HEADER_NAME_RE.match(header)
+        ]
         _custom_event_template = entry.data.get(CONF_CUSTOM_EVENT_DATA_TEMPLATE)
         if _custom_event_template is not None:
             self.custom_event_template = Template(_custom_event_template, hass=hass)
@@ -354,39 +828,531 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
     async def async_start(self) -> None:
         """Start coordinator."""
 
+    async def async_load_state(self) -> None:
+        """Load the sync state that was saved before the last shutdown."""
+        if (state := await self._store.async_load()) is None:
+            return
+        self._uidvalidity = state.get("uidvalidity")
+        self._uid_high_water = state.get("uid_high_water", 0)
+        self._last_message_uid = state.get("last_message_uid")
+        self._last_message_id = state.get("last_message_id")
+        if self._uid_high_water:
+            # Send events for messages that arrived while we were down
+            self._catch_up_after = self._uid_high_water
+
+    def _get_sync_progress(self) -> tuple[int, str | None]:
+        """Return the UID high water mark and the last message to save."""
+        return self._uid_high_water, self._last_message_uid
+
+    def _get_sync_state(self) -> dict[str, Any]:
+        """Return the sync state to save."""
+        uid_high_water, last_message_uid = self._get_sync_progress()
+        return {
+            "uidvalidity": self._uidvalidity,
+            "uid_high_water": uid_high_water,
+            "last_message_uid": last_message_uid,
+            "last_message_id": self._last_message_id,
+        }
+
+    @callback
+    def _async_schedule_save_state(self) -> None:
+        """Schedule saving the sync state."""
+        self._store.async_delay_save(self._get_sync_state, STORAGE_SAVE_DELAY)
+
+    async def _async_fetch_folder_status(self) -> dict[str, int] | None:
+        """Fetch the folder status items of this cycle with a single STATUS.
+
+        STATUS should not be used on the selected folder, so it is only sent
+        when status sensors or the index need it. UIDVALIDITY is taken from
+        the response to SELECT instead.
+        """
+        items: list[str] = []
+        if self._status_sensors:
+            items.extend(("MESSAGES", "UNSEEN", "RECENT", "UIDNEXT"))
+            if self.imap_client.has_capability("STATUS=SIZE"):
+                items.append("SIZE")
+        if self.message_index is not None:
+            items.extend(("UIDNEXT", "MESSAGES"))
+            if self.imap_client.has_capability("CONDSTORE"):
+                items.append("HIGHESTMODSEQ")
+        if not items:
+            return {}
+        response = await self.imap_client.status(
+            self.config_entry.data[CONF_FOLDER],
+            f"({' '.join(dict.fromkeys(items))})",
+        )
+        if response.result != "OK":
+            _LOGGER.debug("Folder status failed: %s", response.lines[-1])
+            return None
+        return {
+            name.decode().lower(): int(value)
+            for name, value in STATUS_ITEM_RE.findall(
+                b" ".join(map(bytes, response.lines))
+            )
+        }
+
+    def _check_uidvalidity(self, uidvalidity: int | None) -> None:
+        """Reset the sync state if the UIDs of the folder were invalidated."""
+        if uidvalidity is None:
+            return
+        if self._uidvalidity is not None and self._uidvalidity != uidvalidity:
+            _LOGGER.debug(
+                "UIDVALIDITY of folder %s changed, resetting sync state",
+                self.config_entry.data[CONF_FOLDER],
+            )
+            self._last_message_uid = None
+            self._uid_high_water = 0
+            self._catch_up_after = None
+        self._uidvalidity = uidvalidity
+
+    async def _async_update_status(self, status: dict[str, int] | None) -> None:
+        """Update the folder status and the quota of the mailbox."""
+        status_data: dict[str, int | None] = {
+            item: value
+            for item, value in (status or {}).items()
+            if item in STATUS_SENSOR_ITEMS
+        }
+        if self.imap_client.has_capability("QUOTA"):
+            protocol = self.imap_client.protocol
+            response = await asyncio.wait_for(
+                protocol.execute(
+                    Command(
+                        "GETQUOTAROOT",
+                        protocol.new_tag(),
+                        self.config_entry.data[CONF_FOLDER],
+                        untagged_resp_name="QUOTA",
+                        loop=protocol.loop,
+                    )
+                ),
+                self.imap_client.timeout,
+            )
+            if response.result == "OK" and (
+                match := QUOTA_STORAGE_RE.search(b" ".join(map(bytes, response.lines)))
+            ):
+                # Storage quota is reported in units of 1024 bytes
+                status_data["quota_usage"] = int(match.group(1))
+                status_data["quota_limit"] = int(match.group(2))
+        self.status_data = status_data
+
+    async def _async_update_extra_searches(self) -> None:
+        """Count the messages of the named searches."""
+        charset = self.config_entry.data[CONF_CHARSET]
+        search_counts: dict[str, int | None] = {}
+        if self.imap_client.has_capability("ESEARCH"):
+            # aioimaplib routes the untagged ESEARCH responses to a single
+            # pending command, so the searches are sent one after another
+            protocol = self.imap_client.protocol
+            for name, criteria in self._extra_searches.items():
+                tag = protocol.new_tag()
+                response = await asyncio.wait_for(
+                    protocol.execute(
+                        Command(
+                            "SEARCH",
+                            tag,
+                            "RETURN (COUNT)",
+                            "CHARSET",
+                            charset,
+                            criteria,
+                            prefix="UID",
+                            untagged_resp_name="ESEARCH",
+                            loop=protocol.loop,
+                        )
+                    ),
+                    self.imap_client.timeout,
+                )
+                counts = {
+                    response_tag.decode(): int(count)
+                    for response_tag, count in ESEARCH_COUNT_RE.findall(
+                        b"\n".join(map(bytes, response.lines))
+                    )
+                }
+                # A response without a count is invalid, not an empty result
+                search_counts[name] = (
+                    counts.get(tag) if response.result == "OK" else None
+                )
+        else:
+            for name, criteria in self._extra_searches.items():
+                result, lines = await self.imap_client.uid_search(
+                    criteria, charset=charset
+                )
+                search_counts[name] = len(lines[0].split()) if result == "OK" else None
+        for name, count in search_counts.items():
+            if count is None:
+                _LOGGER.warning("Invalid response for search '%s'", name)
+        self.search_counts = search_counts
+
+    async def _async_index_messages(self, uids: list[int], condstore: bool) -> None:
+        """Fetch the metadata of new messages and add them to the index."""
+        items = "UID FLAGS RFC822.SIZE ENVELOPE"
+        if condstore:
+            items += " MODSEQ"
+        for start in range(0, len(uids), INDEX_SYNC_CHUNK_SIZE):
+            chunk = uids[start : start + INDEX_SYNC_CHUNK_SIZE]
+            response = await self.imap_client.uid(
+                "fetch", f"{chunk[0]}:{chunk[-1]}", f"({items})"
+            )
+            if response.result != "OK":
+                raise UpdateFailed(f"Indexing messages failed: {response.lines[-1]}")
+            messages = [
+                {
+                    "uid": message["UID"],
+                    "flags": message.get("FLAGS") or [],
+                    "size": message.get("RFC822.SIZE"),
+                    "envelope": parse_envelope(message.get("ENVELOPE")),
+                    "modseq": (message.get("MODSEQ") or [None])[0],
+                }
+                for message in parse_fetch_response(response.lines)
+                if isinstance(message.get("UID"), int)
+            ]
+            await self.hass.async_add_executor_job(
+                self.message_index.add_messages, messages
+            )
+
+    async def _async_sync_index(self, status: dict[str, int] | None) -> None:
+        """Bring the local message index up to date.
+
+        New messages are found through UIDNEXT, flag changes through
+        HIGHESTMODSEQ if the server supports CONDSTORE, and expunged
+        messages through the message count. Without CONDSTORE the flags of
+        all messages are fetched at most every `INDEX_FLAG_SYNC_INTERVAL`.
+        """
+        if status is None:
+            raise UpdateFailed("Folder status failed")
+        index = self.message_index
+        condstore = self.imap_client.has_capability("CONDSTORE")
+        state = await self.hass.async_add_executor_job(index.get_state)
+        if state.get("uidvalidity") != self._uidvalidity:
+            await self.hass.async_add_executor_job(index.reset)
+            state = {"max_uid": 0, "count": 0}
+        max_uid: int = state["max_uid"]
+
+        if condstore:
+            sync_flags = state.get("highestmodseq") != status.get("highestmodseq")
+        else:
+            sync_flags = (
+                self._index_flags_synced is None
+                or time.monotonic() - self._index_flags_synced
+                >= INDEX_FLAG_SYNC_INTERVAL
+            )
+        if max_uid and sync_flags:
+            fetch_items = "(UID FLAGS)"
+            if condstore and state.get("highestmodseq"):
+                fetch_items += f" (CHANGEDSINCE {state['highestmodseq']})"
+            response = await self.imap_client.uid("fetch", f"1:{max_uid}", fetch_items)
+            if response.result != "OK":
+                raise UpdateFailed(f"Syncing flags failed: {response.lines[-1]}")
+            await self.hass.async_add_executor_job(
+                index.update_flags,
+                [
+                    (
+                        message["UID"],
+                        message.get("FLAGS") or [],
+                        (message.get("MODSEQ") or [None])[0],
+                    )
+                    for message in parse_fetch_response(response.lines)
+                    if isinstance(message.get("UID"), int)
+                ],
+            )
+            if not condstore:
+                self._index_flags_synced = time.monotonic()
+
+        added = 0
+        if status.get("uidnext", 0) != state.get("uidnext"):
+            result, lines = await self.imap_client.uid_search(f"UID {max_uid + 1}:*")
+            if result != "OK":
+                raise UpdateFailed(f"Searching new messages failed: {lines[-1]}")
+            # `n:*` always includes the last message, even if its UID is lower
+            new_uids = sorted(uid for uid in map(int, lines[0].split()) if uid > max_uid)
+            await self._async_index_messages(new_uids, condstore)
+            added = len(new_uids)
+
+        if state["count"] + added != status.get("messages"):
+            result, lines = await self.imap_client.uid_search("ALL")
+            if result != "OK":
+                raise UpdateFailed(f"Searching messages failed: {lines[-1]}")
+            await self.hass.async_add_executor_job(
+                index.remove_missing, set(map(int, lines[0].split()))
+            )
+
+        await self.hass.async_add_executor_job(
+            partial(
+                index.set_state,
+                uidvalidity=self._uidvalidity,
+                uidnext=status.get("uidnext"),
+                highestmodseq=status.get("highestmodseq"),
+            )
+        )
+
+    def _get_missed_uids(self, message_uids: list[int]) -> list[int]:
+        """Return the messages that arrived while we were down."""
+        if self._catch_up_after is None:
+            return []
+        missed = [uid for uid in message_uids if uid > self._catch_up_after]
+        self._catch_up_after = None
+        if len(missed) > MAX_CATCH_UP_EVENTS:
+            _LOGGER.warning(
+                "%s messages arrived while offline, sending events for the last %s",
+                len(missed),
+                MAX_CATCH_UP_EVENTS,
+            )
+            missed = missed[-MAX_CATCH_UP_EVENTS:]
+        return missed
+
     async def _async_reconnect_if_needed(self) -> None:
         """Connect to imap server."""
         if self.imap_client is None:
-            self.imap_client = await connect_to_server(self.config_entry.data)
+            with self.tracer.span("connect"):
+                self.imap_client = await connect_to_server(self.config_entry.data)
+
+    async def _async_fetch_summary(
+        self, client: IMAP4, message_uid: str
+    ) -> dict[str, Any] | None:
+        """Fetch the size, structure and rule headers of a message."""
+        message_parts = "RFC822.SIZE BODYSTRUCTURE"
+        if self._rules.active:
+            header_fields = " ".join(self._rules.header_fields).upper()
+            message_parts += f" BODY.PEEK[HEADER.FIELDS ({header_fields})]"
+        elif self._duplicate_mode != DUPLICATE_MODE_OFF:
+            message_parts += " BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)]"
+        response = await client.uid(
+            "fetch", message_uid, f"({message_parts})"
+        )
+        if response.result != "OK":
+            return None
+        return find_fetched_message(
+            parse_fetch_response(response.lines), message_uid
+        )
+
+    async def _async_fetch_message(
+        self, client: IMAP4, message_uid: str, summary: Mapping[str, Any]
+    ) -> ImapMessage | None:
+        """Fetch the parts of a message that are needed for the event."""
+        size: int | None = fetch_item(summary, "RFC822.SIZE")
+        if size is not None and size > self._max_fetch_size:
+            return await self._async_fetch_partial_message(
+                client, message_uid, summary, size
+            )
+
+        if not self._event_headers and STREAMING_SUPPORTED:
+            # The message is parsed while it is received, so the parse span
+            # includes receiving it
+            with self.tracer.span("parse", message_uid):
+                email_message = await async_fetch_message_streaming(
+                    client,
+                    message_uid,
+                    self._get_parse_budget(summary),
+                    self.tracer.profile,
+                )
+                if email_message is None:
+                    return None
+                with self.tracer.profile():
+                    return ImapMessage(email_message, size)
+
+        # Only fetch the whitelisted headers and the headers the event needs
+        message_parts = f"BODY.PEEK[{self._event_header_section}]"
+        if "text" in self._event_data_keys:
+            message_parts = f"({message_parts} BODY.PEEK[TEXT])"
+        response = await client.uid("fetch", message_uid, message_parts)
+        if response.result != "OK" or (
+            message_data := find_fetched_message(
+                parse_fetch_response(response.lines), message_uid
+            )
+        ) is None:
+            return None
+        raw_message: bytes = fetch_item(message_data, "BODY[HEADER") or b""
+        if "text" in self._event_data_keys:
+            raw_message += fetch_item(message_data, "BODY[TEXT]") or b""
+        return self._parse_message(message_uid, raw_message, size)
+
+    async def _async_fetch_partial_message(
+        self, client: IMAP4, message_uid: str, summary: Mapping[str, Any], size: int
+    ) -> ImapMessage | None:
+        """Fetch the headers and the start of the text of a large message."""
+        message_parts = [f"BODY.PEEK[{self._event_header_section}]"]
+        text_part: dict[str, Any] | None = None
+        if "text" in self._event_data_keys:
+            text_part = find_text_part(
+                parse_bodystructure(fetch_item(summary, "BODYSTRUCTURE") or [])
+            )
+        if text_part is not None:
+            message_parts.append(
+                f"BODY.PEEK[{text_part['part']}]<0.{self._get_text_budget()}>"
+            )
+        _LOGGER.debug(
+            "Message with id %s has %s bytes, fetching %s",
+            message_uid,
+            size,
+            message_parts,
+        )
+        response = await client.uid(
+            "fetch", message_uid, f"({' '.join(message_parts)})"
+        )
+        if response.result != "OK" or (
+            message_data := find_fetched_message(
+                parse_fetch_response(response.lines), message_uid
+            )
+        ) is None:
+            return None
+        message = self._parse_message(
+            message_uid, fetch_item(message_data, "BODY[HEADER") or b"", size
+        )
+        if text_part is not None:
+            message.set_text_part(
+                fetch_item(message_data, f"BODY[{text_part['part']}]") or b"",
+                text_part,
+            )
+        return message
+
+    def _get_text_budget(self) -> int:
+        """Return the bytes of a text part needed for the text of an event."""
+        return self._max_event_size * PARTIAL_TEXT_FACTOR
 
-    async def _async_process_event(self, last_message_uid: str) -> None:
+    def _get_parse_budget(self, summary: Mapping[str, Any]) -> int | None:
+        """Return the bytes of the body to parse, `None` for the whole body.
+
+        The body can only be cut if the text is in the first part.
+        """
+        if "text" not in self._event_data_keys:
+            return 0
+        if (body_structure := fetch_item(summary, "BODYSTRUCTURE")) is None:
+            return None
+        structure = parse_bodystructure(body_structure)
+        if (text_part := find_text_part(structure)) is None:
+            return 0
+        if text_part is not next(iter_body_parts(structure)):
+            return None
+        return self._get_text_budget() + MIME_PART_HEADER_SIZE
+
+    def _parse_message(
+        self, message_uid: str, raw_message: bytes, size: int | None
+    ) -> ImapMessage:
+        """Parse a fetched message."""
+        with self.tracer.span("parse", message_uid), self.tracer.profile():
+            return ImapMessage(raw_message, size)
+
+    @property
+    def _event_header_section(self) -> str:
+        """Return the header section to fetch for the event."""
+        if not self._event_headers:
+            return "HEADER"
+        header_fields = " ".join(
+            dict.fromkeys([*EVENT_HEADER_FIELDS, *self._event_headers])
+        ).upper()
+        return f"HEADER.FIELDS ({header_fields})"
+
+    def _match_rules(self, message_uid: str, summary: Mapping[str, Any]) -> bool:
+        """Evaluate the message rules on the headers and size of a message."""
+        if not self._rules.active:
+            return True
+        headers = ImapMessage(fetch_item(summary, "BODY[HEADER") or b"")
+        if self._rules.match(
+            headers.sender,
+            headers.subject,
+            set(headers.email_message.keys()),
+            fetch_item(summary, "RFC822.SIZE"),
+        ):
+            return True
+        _LOGGER.debug(
+            "Message with id %s does not match the rules, sender: %s, subject: %s",
+            message_uid,
+            headers.sender,
+            headers.subject,
+        )
+        return False
+
+    def _check_duplicate(self, message_uid: str, summary: Mapping[str, Any]) -> bool:
+        """Return if another message with the same Message-ID was processed."""
+        if self._duplicate_mode == DUPLICATE_MODE_OFF:
+            return False
+        headers = ImapMessage(fetch_item(summary, "BODY[HEADER") or b"")
+        if (message_id := headers.message_id) is None:
+            return False
+        if (processed := self._processed_message_ids.get(message_id)) is None:
+            return False
+        # The same message in this entry is handled with `initial`
+        return processed != (self.config_entry.entry_id, message_uid)
+
+    def _record_processed(self, message_uid: str, message_id: str | None) -> None:
+        """Record the Message-ID of a message after its event was fired."""
+        if self._duplicate_mode == DUPLICATE_MODE_OFF or message_id is None:
+            return
+        if self._processed_message_ids.get(message_id) is None:
+            self._processed_message_ids.set(
+                message_id, (self.config_entry.entry_id, message_uid)
+            )
+
+    def _get_event_field(self, message: ImapMessage, key: str) -> Any:
+        """Return a message field for the event data."""
+        if key == "headers":
+            return message.get_headers(self._event_headers)
+        if key == "text":
+            return message.get_text(self._max_event_size)
+        return getattr(message, key)
+
+    async def _async_process_event(self, client: IMAP4, last_message_uid: str) -> None:
         """Send a event for the last message if the last message was changed."""
-        response = await self.imap_client.fetch(last_message_uid, "BODY.PEEK[]")
-        if response.result == "OK":
-            message = ImapMessage(response.lines[1])
+        with self.tracer.span("fetch_summary", last_message_uid):
+            summary = await self._async_fetch_summary(client, last_message_uid)
+        if summary is None:
+            return
+        if not self._match_rules(last_message_uid, summary):
+            return
+        duplicate = self._check_duplicate(last_message_uid, summary)
+        if duplicate and self._duplicate_mode == DUPLICATE_MODE_SUPPRESS:
+            _LOGGER.debug(
+                "Message with id %s was already processed, skipping the event",
+                last_message_uid,
+            )
+            return
+        with self.tracer.span("fetch", last_message_uid):
+            message = await self._async_fetch_message(
+                client, last_message_uid, summary
+            )
+        if message is not None:
             # Set `initial` to `False` if the last message is triggered again
             initial: bool = True
             if (message_id := message.message_id) == self._last_message_id:
                 initial = False
             self._last_message_id = message_id
-            data = {
-                "entry_id": self.config_entry.entry_id,
-                "server": self.config_entry.data[CONF_SERVER],
-                "username": self.config_entry.data[CONF_USERNAME],
-                "search": self.config_entry.data[CONF_SEARCH],
-                "folder": self.config_entry.data[CONF_FOLDER],
-                "initial": initial,
-                "date": message.date,
-                "sender": message.sender,
-                "subject": message.subject,
-                "uid": last_message_uid,
-            }
-            data.update({key: getattr(message, key) for key in self._event_data_keys})
+            data: dict[str, Any] = {}
+            budget = EventSizeBudget(MAX_EVENT_DATA_BYTES)
+            budget.update(
+                data,
+                {
+                    "entry_id": self.config_entry.entry_id,
+                    "server": self.config_entry.data[CONF_SERVER],
+                    "username": self.config_entry.data[CONF_USERNAME],
+                    "search": self.config_entry.data[CONF_SEARCH],
+                    "folder": self.config_entry.data[CONF_FOLDER],
+                    "initial": initial,
+                    "date": message.date,
+                    "sender": message.sender,
+                    "subject": message.subject,
+                    "uid": last_message_uid,
+                    "size": message.size,
+                    "truncated": False,
+                },
+            )
+            if self._duplicate_mode == DUPLICATE_MODE_TAG:
+                budget.set(data, "duplicate", duplicate)
+            with self.tracer.span("extract", last_message_uid), self.tracer.profile():
+                budget.update(
+                    data,
+                    {
+                        key: self._get_event_field(message, key)
+                        for key in self._event_data_keys
+                    },
+                )
             if self.custom_event_template is not None:
                 try:
-                    data["custom"] = self.custom_event_template.async_render(
-                        data, parse_result=True
-                    )
+                    with (
+                        self.tracer.span("render", last_message_uid),
+                        self.tracer.profile(),
+                    ):
+                        custom = self.custom_event_template.async_render(
+                            data, parse_result=True
+                        )
+                    budget.set(data, "custom", custom)
                     _LOGGER.debug(
                         "IMAP custom template (%s) for msguid %s (%s) rendered to: %s, initial: %s",
                         self.custom_event_template,
@@ -396,7 +1362,7 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
                         initial,
                     )
                 except TemplateError as err:
-                    data["custom"] = None
+                    budget.set(data, "custom", None)
                     _LOGGER.error(
                         "Error rendering IMAP custom template (%s) for msguid %s "
                         "failed with message: %s",
@@ -405,20 +1371,46 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
                         err,
                     )
             if "text" in data:
-                data["text"] = message.text[: self._max_event_size]
-            self._update_diagnostics(data)
-            if (size := len(json_bytes(data))) > MAX_EVENT_DATA_BYTES:
+                budget.set(data, "text", data["text"][: self._max_event_size])
+            if self._event_mode == EVENT_MODE_REFERENCE:
+                # Keep the payload out of the event bus and the recorder
+                payload_key = uuid4().hex
+                self.event_payloads.set(payload_key, data)
+                self._update_diagnostics(data)
+                with self.tracer.span("fire", last_message_uid):
+                    self.hass.bus.fire(
+                        EVENT_IMAP,
+                        {
+                            **{
+                                key: data[key]
+                                for key in REFERENCE_EVENT_FIELDS
+                                if key in data
+                            },
+                            "payload_key": payload_key,
+                        },
+                    )
+                self._record_processed(last_message_uid, message_id)
+                _LOGGER.debug(
+                    "Message with id %s (%s) cached with key %s, initial: %s",
+                    last_message_uid,
+                    message_id,
+                    payload_key,
+                    initial,
+                )
+                return
+            if budget.fit(data):
                 _LOGGER.warning(
-                    "Custom imap_content event skipped, size (%s) exceeds "
+                    "Custom imap_content event truncated to fit "
                     "the maximal event size (%s), sender: %s, subject: %s",
-                    size,
                     MAX_EVENT_DATA_BYTES,
                     message.sender,
                     message.subject,
                 )
-                return
+            self._update_diagnostics(data)
 
-            self.hass.bus.fire(EVENT_IMAP, data)
+            with self.tracer.span("fire", last_message_uid):
+                self.hass.bus.fire(EVENT_IMAP, data)
+            self._record_processed(last_message_uid, message_id)
             _LOGGER.debug(
                 "Message with id %s (%s) processed, sender: %s, subject: %s, initial: %s",
                 last_message_uid,
@@ -432,32 +1424,54 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
         """Fetch last message and messages count."""
         await self._async_reconnect_if_needed()
         await self.imap_client.noop()
-        result, lines = await self.imap_client.search(
-            self.config_entry.data[CONF_SEARCH],
-            charset=self.config_entry.data[CONF_CHARSET],
-        )
+        if not self._uidvalidity_checked:
+            self._check_uidvalidity(get_selected_uidvalidity(self.imap_client))
+            self._uidvalidity_checked = True
+        status = await self._async_fetch_folder_status()
+        if self._status_sensors:
+            await self._async_update_status(status)
+        if self._extra_searches:
+            await self._async_update_extra_searches()
+        if self.message_index is not None:
+            # The index is optional, failing to update it must not stop the sync
+            try:
+                await self._async_sync_index(status)
+            except (sqlite3.Error, UpdateFailed, AioImapException) as err:
+                _LOGGER.warning("Updating the message index failed: %s", err)
+        with self.tracer.span("search"):
+            result, lines = await self.imap_client.uid_search(
+                self.config_entry.data[CONF_SEARCH],
+                charset=self.config_entry.data[CONF_CHARSET],
+            )
         if result != "OK":
             raise UpdateFailed(
                 f"Invalid response for search '{self.config_entry.data[CONF_SEARCH]}': {result} / {lines[0]}"
             )
         if not (count := len(message_ids := lines[0].split())):
             self._last_message_uid = None
+            self._catch_up_after = None
+            self._async_schedule_save_state()
             return 0
-        last_message_uid = (
-            str(message_ids[-1:][0], encoding=self.config_entry.data[CONF_CHARSET])
-            if count
-            else None
-        )
-        if (
-            count
-            and last_message_uid is not None
-            and self._last_message_uid != last_message_uid
-        ):
+        message_uids = [int(uid) for uid in message_ids]
+        last_message_uid = str(message_uids[-1])
+        if self._last_message_uid != last_message_uid:
+            new_uids = [
+                *(str(uid) for uid in self._get_missed_uids(message_uids[:-1])),
+                last_message_uid,
+            ]
             self._last_message_uid = last_message_uid
-            await self._async_process_event(last_message_uid)
+            await self._async_process_new_messages(new_uids)
+        self._catch_up_after = None
+        self._uid_high_water = max(self._uid_high_water, message_uids[-1])
+        self._async_schedule_save_state()
 
         return count
 
+    async def _async_process_new_messages(self, message_uids: list[str]) -> None:
+        """Send events for new messages."""
+        for message_uid in message_uids:
+            await self._async_process_event(self.imap_client, message_uid)
+
     async def _cleanup(self, log_error: bool = False) -> None:
         """Close resources."""
         if self.imap_client:
@@ -472,10 +1486,13 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
                     _LOGGER.debug("Error while cleaning up imap connection")
             finally:
                 self.imap_client = None
+                self._uidvalidity_checked = False
 
     async def shutdown(self, *_: Any) -> None:
         """Close resources."""
         await self._cleanup(log_error=True)
+        if self.message_index is not None:
+            await self.hass.async_add_executor_job(self.message_index.close)
 
     def _update_diagnostics(self, data: dict[str, Any]) -> None:
         """Update the diagnostics."""
@@ -494,18 +1511,38 @@ class ImapDataUpdateCoordinator(DataUpdateCoordinator[int | None]):
         """Return diagnostics info."""
         return self._diagnostics_data
 
+    @property
+    def connection_diagnostics(self) -> dict[str, Any]:
+        """Return diagnostics info about the connection."""
+        return {
+            "compression": get_compression_stats(self.imap_client),
+            "tls": get_tls_stats(
+                self.config_entry.data[CONF_SERVER],
+                self.config_entry.data[CONF_PORT],
+                self.config_entry.data.get(CONF_VERIFY_SSL, True),
+                self.config_entry.data.get(
+                    CONF_SSL_CIPHER_LIST, SSLCipherList.PYTHON_DEFAULT
+                ),
+            ),
+            "entry_connections": self.entry_connections,
+            "scheduler": self.scheduler.metrics,
+        }
+
+    @property
+    def entry_connections(self) -> int:
+        """Return the open long-lived connections, which are not scheduled."""
+        return int(self.imap_client is not None)
+
 
 class ImapPollingDataUpdateCoordinator(ImapDataUpdateCoordinator):
     """Class for imap client."""
 
     def __init__(
-        self, hass: HomeAssistant, imap_client: IMAP4, entry: ConfigEntry
+        self, hass: HomeAssistant, imap_client: IMAP4 | None, entry: ConfigEntry
     ) -> None:
         """Initiate imap client."""
-        _LOGGER.debug(
-            "Connected to server %s using IMAP polling", entry.data[CONF_SERVER]
-        )
-        super().__init__(hass, imap_client, entry, timedelta(seconds=3600))
+        _LOGGER.debug("Using IMAP polling for server %s", entry.data[CONF_SERVER])
+        super().__init__(hass, imap_client, entry, POLLING_INTERVAL)
 
     async def _async_update_data(self) -> int | None:
         """Update the number of unread emails."""
@@ -545,13 +1582,21 @@ class ImapPushDataUpdateCoordinator(ImapDataUpdateCoordinator):
     """Class for imap client."""
 
     def __init__(
-        self, hass: HomeAssistant, imap_client: IMAP4, entry: ConfigEntry
+        self, hass: HomeAssistant, imap_client: IMAP4 | None, entry: ConfigEntry
     ) -> None:
         """Initiate imap client."""
-        _LOGGER.debug("Connected to server %s using IMAP push", entry.data[CONF_SERVER])
+        _LOGGER.debug("Using IMAP push for server %s", entry.data[CONF_SERVER])
         super().__init__(hass, imap_client, entry, None)
         self._push_wait_task: asyncio.Task[None] | None = None
         self.number_of_messages: int | None = None
+        self._message_queue: asyncio.Queue[str] = asyncio.Queue(PUSH_QUEUE_SIZE)
+        self._consumer_task: asyncio.Task[None] | None = None
+        self._consumer_client: IMAP4 | None = None
+        # Progress up to the last processed message while messages are queued
+        self._processed_progress: tuple[int, str | None] | None = None
+        self._max_queue_depth = 0
+        self._processed_messages = 0
+        self._failed_messages = 0
 
     async def _async_update_data(self) -> int | None:
         """Update the number of unread emails."""
@@ -560,10 +1605,102 @@ class ImapPushDataUpdateCoordinator(ImapDataUpdateCoordinator):
 
     async def async_start(self) -> None:
         """Start coordinator."""
+        if self._consumer_task is None:
+            self._consumer_task = self.hass.async_create_background_task(
+                self._async_consume_messages(), "Process IMAP messages"
+            )
+        if self._push_wait_task is not None and not self._push_wait_task.done():
+            return
         self._push_wait_task = self.hass.async_create_background_task(
             self._async_wait_push_loop(), "Wait for IMAP data push"
         )
 
+    def _get_sync_progress(self) -> tuple[int, str | None]:
+        """Return the sync progress of the processed messages.
+
+        Messages that are still queued are processed again after a restart.
+        """
+        if self._processed_progress is not None:
+            return self._processed_progress
+        return super()._get_sync_progress()
+
+    async def _async_process_new_messages(self, message_uids: list[str]) -> None:
+        """Queue new messages for the consumer, waiting while the queue is full."""
+        if self._processed_progress is None:
+            # The high water mark is updated after the messages are queued
+            self._processed_progress = (
+                self._uid_high_water,
+                str(self._uid_high_water) if self._uid_high_water else None,
+            )
+        for message_uid in message_uids:
+            await self._message_queue.put(message_uid)
+            self._max_queue_depth = max(
+                self._max_queue_depth, self._message_queue.qsize()
+            )
+
+    async def _async_consume_messages(self) -> None:
+        """Process queued messages in order on the processing connection."""
+        while True:
+            message_uid = await self._message_queue.get()
+            try:
+                await self._async_consume_message(message_uid)
+            except Exception:  # noqa: BLE001
+                self._failed_messages += 1
+                _LOGGER.exception(
+                    "Unexpected error processing message with id %s", message_uid
+                )
+                # The state of the connection is unknown
+                await self._async_close_consumer_client()
+            finally:
+                self._message_queue.task_done()
+            uid_high_water, _ = self._processed_progress or (0, None)
+            self._processed_progress = (
+                None
+                if self._message_queue.empty()
+                else (max(uid_high_water, int(message_uid)), message_uid)
+            )
+            self._async_schedule_save_state()
+
+    async def _async_consume_message(self, message_uid: str) -> None:
+        """Process a message, reconnecting once if the connection was lost."""
+        for retry in (False, True):
+            try:
+                if self._consumer_client is None:
+                    with self.tracer.span("connect"):
+                        self._consumer_client = await connect_to_server(
+                            self.config_entry.data
+                        )
+                await self._async_process_event(self._consumer_client, message_uid)
+            except (AioImapException, TimeoutError) as ex:
+                await self._async_close_consumer_client()
+                if retry:
+                    self._failed_messages += 1
+                    _LOGGER.warning(
+                        "Processing message with id %s failed: %s", message_uid, ex
+                    )
+            except (InvalidAuth, InvalidFolder) as ex:
+                self._failed_messages += 1
+                _LOGGER.warning(
+                    "Processing message with id %s failed: %s", message_uid, ex
+                )
+                # The queue fills up while the connection fails
+                await asyncio.sleep(BACKOFF_TIME)
+                return
+            else:
+                self._processed_messages += 1
+                return
+
+    async def _async_close_consumer_client(self) -> None:
+        """Log out from the processing connection."""
+        if (client := self._consumer_client) is None:
+            return
+        self._consumer_client = None
+        try:
+            await client.close()
+            await client.logout()
+        except (AioImapException, TimeoutError):
+            _LOGGER.debug("Error while closing the processing connection")
+
     async def _async_wait_push_loop(self) -> None:
         """Wait for data push from server."""
         while True:
@@ -599,6 +1736,10 @@ class ImapPushDataUpdateCoordinator(ImapDataUpdateCoordinator):
             else:
                 self.auth_errors = 0
                 self.async_set_updated_data(self.number_of_messages)
+            if not self.imap_client.has_capability("IDLE"):
+                # Fall back to polling if the server does not support push
+                await asyncio.sleep(POLLING_INTERVAL.total_seconds())
+                continue
             try:
                 idle: asyncio.Future = await self.imap_client.idle_start()
                 await self.imap_client.wait_server_push()
@@ -615,8 +1756,31 @@ class ImapPushDataUpdateCoordinator(ImapDataUpdateCoordinator):
                 await self._cleanup()
                 await asyncio.sleep(BACKOFF_TIME)
 
+    @property
+    def entry_connections(self) -> int:
+        """Return the open long-lived connections, which are not scheduled."""
+        return super().entry_connections + int(self._consumer_client is not None)
+
+    @property
+    def connection_diagnostics(self) -> dict[str, Any]:
+        """Return diagnostics info about the connection and the push queue."""
+        return {
+            **super().connection_diagnostics,
+            "push_queue": {
+                "depth": self._message_queue.qsize(),
+                "max_depth": self._max_queue_depth,
+                "size": PUSH_QUEUE_SIZE,
+                "processed": self._processed_messages,
+                "failed": self._failed_messages,
+            },
+        }
+
     async def shutdown(self, *_: Any) -> None:
         """Close resources."""
         if self._push_wait_task:
             self._push_wait_task.cancel()
+        if self._consumer_task:
+            self._consumer_task.cancel()
+            self._consumer_task = None
+        await self._async_close_consumer_client()
         await super().shutdown()
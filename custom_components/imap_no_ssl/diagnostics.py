@@ -34,4 +34,6 @@ def _async_get_diagnostics(
     return {
         "config": redacted_config,
         "event": coordinator.diagnostics_data,
+        "connection": coordinator.connection_diagnostics,
+        "tracing": coordinator.tracer.as_dict,
     }
@@ -0,0 +1,202 @@
+"""Export messages to mbox files and Maildir directories.
+
+The checkpoint of an export is saved after each batch. A batch that was
+written before an interruption, but not recorded in the checkpoint, is
+written again without duplicates: an mbox file is cut back to its size
+at the checkpoint, and Maildir files are named after the message UID.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import datetime
+import json
+import mailbox
+import os
+from pathlib import Path
+import re
+from typing import Any
+
+EXPORT_FORMAT_MBOX = "mbox"
+EXPORT_FORMAT_MAILDIR = "maildir"
+EXPORT_FORMATS = [EXPORT_FORMAT_MBOX, EXPORT_FORMAT_MAILDIR]
+
+MAILDIR_FLAGS = {
+    "\\SEEN": "S",
+    "\\ANSWERED": "R",
+    "\\FLAGGED": "F",
+    "\\DELETED": "T",
+    "\\DRAFT": "D",
+}
+
+MBOX_FROM_RE = re.compile(rb"^(>*From )", re.MULTILINE)
+
+
+def parse_internaldate(value: str | None) -> datetime | None:
+    """Parse an IMAP INTERNALDATE."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), "%d-%b-%Y %H:%M:%S %z")
+    except ValueError:
+        return None
+
+
+def iter_batches(
+    sizes: list[tuple[int, int | None]], max_messages: int, max_bytes: int
+) -> Iterator[list[int]]:
+    """Split UIDs with their sizes into batches limited in count and bytes.
+
+    A message larger than `max_bytes` is a batch of its own.
+    """
+    batch: list[int] = []
+    batch_bytes = 0
+    for uid, size in sizes:
+        size = size or 0
+        if batch and (len(batch) >= max_messages or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(uid)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+class MboxWriter:
+    """Append messages to an mbox file in mboxrd format."""
+
+    def __init__(self, path: str, size: int | None = None) -> None:
+        """Open the mbox file for appending, cut back to `size` if given."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "ab")  # noqa: SIM115
+        if size is not None:
+            # Remove the messages written after the last checkpoint
+            self._file.truncate(size)
+        self._file.seek(0, os.SEEK_END)
+
+    @property
+    def size(self) -> int | None:
+        """Return the size of the mbox file."""
+        return self._file.tell()
+
+    def add(
+        self, uid: int, message: bytes, date: datetime | None, flags: list[str]
+    ) -> None:
+        """Append a message."""
+        from_date = (date or datetime.now()).strftime("%a %b %d %H:%M:%S %Y")
+        content = MBOX_FROM_RE.sub(rb">\1", message.replace(b"\r\n", b"\n"))
+        if not content.endswith(b"\n"):
+            content += b"\n"
+        self._file.write(f"From MAILER-DAEMON {from_date}\n".encode("ascii"))
+        self._file.write(content)
+        self._file.write(b"\n")
+
+    def flush(self) -> None:
+        """Flush the written messages to disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Close the mbox file."""
+        self._file.close()
+
+
+class MaildirWriter:
+    """Add messages to a Maildir directory."""
+
+    def __init__(self, path: str, uidvalidity: int | None) -> None:
+        """Open or create the Maildir directory."""
+        self._maildir = mailbox.Maildir(path, create=True)
+        self._path = Path(path)
+        self._uidvalidity = uidvalidity or 0
+
+    @property
+    def size(self) -> int | None:
+        """Maildir files are not cut back."""
+        return None
+
+    def add(
+        self, uid: int, message: bytes, date: datetime | None, flags: list[str]
+    ) -> None:
+        """Add a message with its flags, replacing an earlier export of it."""
+        colon = self._maildir.colon
+        name = f"{self._uidvalidity}.{uid}.imap_export"
+        for subdir in ("new", "cur"):
+            directory = self._path / subdir
+            for existing in (directory / name, *directory.glob(f"{name}{colon}*")):
+                existing.unlink(missing_ok=True)
+        info = "".join(
+            sorted(
+                MAILDIR_FLAGS[flag.upper()]
+                for flag in flags
+                if flag.upper() in MAILDIR_FLAGS
+            )
+        )
+        subdir = "cur" if "\\SEEN" in (flag.upper() for flag in flags) else "new"
+        temp = self._path / "tmp" / name
+        temp.write_bytes(message)
+        if date is not None:
+            os.utime(temp, (date.timestamp(), date.timestamp()))
+        os.replace(
+            temp,
+            self._path / subdir / (f"{name}{colon}2,{info}" if info else name),
+        )
+
+    def flush(self) -> None:
+        """Maildir messages are written to disk when they are added."""
+
+    def close(self) -> None:
+        """Close the Maildir directory."""
+        self._maildir.close()
+
+
+def create_writer(
+    export_format: str, path: str, checkpoint: dict[str, Any]
+) -> MboxWriter | MaildirWriter:
+    """Create a writer for the export format that resumes at the checkpoint."""
+    if export_format == EXPORT_FORMAT_MAILDIR:
+        return MaildirWriter(path, checkpoint.get("uidvalidity"))
+    return MboxWriter(path, checkpoint.get("size"))
+
+
+def checkpoint_path(export_format: str, path: str) -> Path:
+    """Return the path of the checkpoint file of an export."""
+    if export_format == EXPORT_FORMAT_MAILDIR:
+        return Path(path) / ".imap_export.json"
+    return Path(f"{path}.imap_export.json")
+
+
+def load_checkpoint(export_format: str, path: str) -> dict[str, Any] | None:
+    """Load the checkpoint of an earlier export."""
+    try:
+        checkpoint: dict[str, Any] = json.loads(
+            checkpoint_path(export_format, path).read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+    return checkpoint
+
+
+def save_checkpoint(export_format: str, path: str, checkpoint: dict[str, Any]) -> None:
+    """Atomically save the checkpoint of an export."""
+    target = checkpoint_path(export_format, path)
+    temp = target.with_name(f"{target.name}.tmp")
+    temp.write_text(json.dumps(checkpoint), encoding="utf-8")
+    os.replace(temp, target)
+
+
+def write_batch(
+    writer: MboxWriter | MaildirWriter,
+    messages: list[tuple[int, bytes, datetime | None, list[str]]],
+    export_format: str,
+    path: str,
+    checkpoint: dict[str, Any],
+) -> None:
+    """Write a batch of messages and save the checkpoint after it."""
+    for uid, message, date, flags in messages:
+        writer.add(uid, message, date, flags)
+    writer.flush()
+    if (size := writer.size) is not None:
+        checkpoint["size"] = size
+    save_checkpoint(export_format, path, checkpoint)
@@ -0,0 +1,250 @@
+"""Local SQLite index of the message metadata of a folder.
+
+All methods block and must be run in the executor.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+import json
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    uid INTEGER PRIMARY KEY,
+    flags TEXT NOT NULL,
+    seen INTEGER NOT NULL,
+    flagged INTEGER NOT NULL,
+    size INTEGER,
+    date TEXT,
+    subject TEXT,
+    sender TEXT,
+    sender_name TEXT,
+    recipients TEXT,
+    message_id TEXT,
+    in_reply_to TEXT,
+    modseq INTEGER
+);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (date);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+# Message fields returned by a query
+MESSAGE_COLUMNS = (
+    "uid",
+    "flags",
+    "size",
+    "date",
+    "subject",
+    "sender",
+    "sender_name",
+    "recipients",
+    "message_id",
+    "in_reply_to",
+)
+
+
+def _iso_date(value: str | None) -> str | None:
+    """Convert an envelope date to UTC in ISO format so it sorts correctly."""
+    if not value:
+        return None
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=UTC)
+    return date.astimezone(UTC).isoformat()
+
+
+def _escape_like(value: str) -> str:
+    """Escape the wildcards of a LIKE pattern with `\\`."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _flag_columns(flags: list[str]) -> tuple[str, int, int]:
+    """Return the flags, seen and flagged columns."""
+    upper_flags = {flag.upper() for flag in flags}
+    return (
+        json.dumps(flags),
+        int("\\SEEN" in upper_flags),
+        int("\\FLAGGED" in upper_flags),
+    )
+
+
+class MessageIndex:
+    """Message metadata of one folder stored in SQLite."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the index."""
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Return the database connection, opening it if needed."""
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get_state(self) -> dict[str, int]:
+        """Return the sync state of the index."""
+        with self._lock:
+            state = {
+                row["key"]: row["value"]
+                for row in self._db.execute("SELECT key, value FROM state")
+            }
+            state["max_uid"] = (
+                self._db.execute("SELECT MAX(uid) FROM messages").fetchone()[0] or 0
+            )
+            state["count"] = self._db.execute(
+                "SELECT COUNT(*) FROM messages"
+            ).fetchone()[0]
+        return state
+
+    def set_state(self, **state: int | None) -> None:
+        """Store sync state values."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                state.items(),
+            )
+
+    def reset(self) -> None:
+        """Remove all messages and the sync state."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages")
+            self._db.execute("DELETE FROM state")
+
+    def add_messages(self, messages: Iterable[dict[str, Any]]) -> None:
+        """Add or replace messages."""
+        rows = []
+        for message in messages:
+            envelope: dict[str, Any] = message["envelope"]
+            sender = (envelope.get("from") or [{}])[0]
+            rows.append(
+                (
+                    message["uid"],
+                    *_flag_columns(message["flags"]),
+                    message.get("size"),
+                    _iso_date(envelope.get("date")),
+                    envelope.get("subject"),
+                    (sender.get("email") or "").lower() or None,
+                    sender.get("name"),
+                    json.dumps(
+                        [
+                            address["email"]
+                            for address in (envelope.get("to") or [])
+                            + (envelope.get("cc") or [])
+                        ]
+                    ),
+                    envelope.get("message_id"),
+                    envelope.get("in_reply_to"),
+                    message.get("modseq"),
+                )
+            )
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages (uid, flags, seen, flagged, size, "
+                "date, subject, sender, sender_name, recipients, message_id, "
+                "in_reply_to, modseq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def update_flags(
+        self, changes: Iterable[tuple[int, list[str], int | None]]
+    ) -> None:
+        """Update the flags of messages."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE messages SET flags = ?, seen = ?, flagged = ?, "
+                "modseq = COALESCE(?, modseq) WHERE uid = ?",
+                (
+                    (*_flag_columns(flags), modseq, uid)
+                    for uid, flags, modseq in changes
+                ),
+            )
+
+    def remove_missing(self, uids: set[int]) -> int:
+        """Remove the messages that are not in `uids`, return the number removed."""
+        with self._lock, self._db:
+            indexed = {row[0] for row in self._db.execute("SELECT uid FROM messages")}
+            removed = indexed - uids
+            self._db.executemany(
+                "DELETE FROM messages WHERE uid = ?", ((uid,) for uid in removed)
+            )
+        return len(removed)
+
+    def query(
+        self,
+        sender: str | None = None,
+        subject: str | None = None,
+        seen: bool | None = None,
+        flagged: bool | None = None,
+        since: datetime | None = None,
+        limit: int = 10,
+    ) -> dict[str, Any]:
+        """Return the number of matching messages and the newest matches."""
+        conditions: list[str] = []
+        parameters: list[Any] = []
+        if sender:
+            # A sender without `@` matches the domain and its subdomains
+            if "@" in sender.lstrip("@"):
+                conditions.append("sender = ?")
+                parameters.append(sender.lower())
+            else:
+                domain = _escape_like(sender.lower().lstrip("@"))
+                conditions.append(
+                    "(sender LIKE ? ESCAPE '\\' OR sender LIKE ? ESCAPE '\\')"
+                )
+                parameters.extend((f"%@{domain}", f"%.{domain}"))
+        if subject:
+            conditions.append("subject LIKE ? ESCAPE '\\'")
+            parameters.append(f"%{_escape_like(subject)}%")
+        if seen is not None:
+            conditions.append("seen = ?")
+            parameters.append(int(seen))
+        if flagged is not None:
+            conditions.append("flagged = ?")
+            parameters.append(int(flagged))
+        if since:
+            conditions.append("date >= ?")
+            parameters.append(since.astimezone(UTC).isoformat())
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            count = self._db.execute(
+                f"SELECT COUNT(*) FROM messages{where}", parameters
+            ).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages{where} "
+                "ORDER BY uid DESC LIMIT ?",
+                [*parameters, limit],
+            ).fetchall()
+        messages = []
+        for row in rows:
+            message = dict(row)
+            message["flags"] = json.loads(message["flags"])
+            message["recipients"] = json.loads(message["recipients"] or "[]")
+            message["uid"] = str(message["uid"])
+            messages.append(message)
+        return {"count": count, "messages": messages}
@@ -0,0 +1,90 @@
+"""Pipelining of IMAP commands on one connection."""
+
+from __future__ import annotations
+
+import asyncio
+
+from aioimaplib import IMAP4, Abort, Command, Response
+
+# Name of the untagged responses the commands receive
+UNTAGGED_RESPONSE_NAMES = {"STORE": "FETCH", "MOVE": "EXPUNGE"}
+
+
+class ImapPipeline:
+    """Send independent IMAP commands at once and match the tagged responses.
+
+    aioimaplib waits for the response of a command before it sends a command
+    that could receive the same untagged responses. The pipeline writes all
+    commands in one go instead, so they cost a single round trip. Only one
+    command per untagged response name receives untagged data, so add
+    `.SILENT` to STORE commands that are pipelined with a FETCH.
+
+    Commands are executed by the server in order, but a failing command does
+    not stop the commands after it. Only pipeline commands that are safe to
+    run when an earlier command fails.
+
+    The pipeline bypasses the command queue of aioimaplib, which also runs
+    commands like MOVE one at a time, so it needs a session of its own that
+    has no other command running, like the sessions of the services.
+    """
+
+    def __init__(self, client: IMAP4) -> None:
+        """Initialize the pipeline."""
+        self._client = client
+        self._commands: list[Command] = []
+
+    def add(
+        self,
+        name: str,
+        *args: str,
+        by_uid: bool = False,
+        untagged_resp_name: str | None = None,
+    ) -> ImapPipeline:
+        """Add a command to the pipeline."""
+        protocol = self._client.protocol
+        tag = protocol.new_tag()
+        untagged_resp_name = untagged_resp_name or UNTAGGED_RESPONSE_NAMES.get(
+            name, name
+        )
+        if any(
+            command.untagged_resp_name == untagged_resp_name
+            for command in self._commands
+        ):
+            # Untagged responses of this type are already routed to an
+            # earlier command of the pipeline
+            untagged_resp_name = f"{untagged_resp_name}_{tag}"
+        self._commands.append(
+            Command(
+                name,
+                tag,
+                *args,
+                prefix="UID" if by_uid else None,
+                untagged_resp_name=untagged_resp_name,
+                loop=protocol.loop,
+            )
+        )
+        return self
+
+    async def execute(self) -> list[Response]:
+        """Send all commands and wait for their responses."""
+        protocol = self._client.protocol
+        commands, self._commands = self._commands, []
+        if (
+            protocol.pending_sync_command is not None
+            or protocol.pending_async_commands
+        ):
+            raise Abort("Pipelining needs a session without pending commands or IDLE")
+        for command in commands:
+            protocol.pending_async_commands[command.untagged_resp_name] = command
+        protocol.transport.write(
+            b"".join(f"{command}\r\n".encode() for command in commands)
+        )
+        try:
+            async with asyncio.timeout(self._client.timeout):
+                await asyncio.gather(*(command.wait() for command in commands))
+        finally:
+            pending = protocol.pending_async_commands
+            for command in commands:
+                if pending.get(command.untagged_resp_name) is command:
+                    del pending[command.untagged_resp_name]
+        return [command.response for command in commands]
@@ -0,0 +1,86 @@
+"""Rules to filter messages before their body is fetched."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+import re
+from typing import Any
+
+from .const import (
+    CONF_FILTER_HEADERS,
+    CONF_FILTER_MAX_SIZE,
+    CONF_FILTER_SENDERS,
+    CONF_FILTER_SUBJECT,
+    HEADER_NAME_RE,
+)
+
+
+class MessageRules:
+    """Rules a message must match before it is fetched and an event is sent.
+
+    All configured rules must match. A sender rule matches the full address
+    or, if it has no `@`, the domain of the sender.
+    """
+
+    def __init__(
+        self,
+        senders: list[str],
+        subject: str | None,
+        headers: list[str],
+        max_size: int,
+    ) -> None:
+        """Initialize the rules."""
+        self.senders = {sender.strip().lower() for sender in senders if sender}
+        self.subject_re = re.compile(subject, re.IGNORECASE) if subject else None
+        self.headers = [header for header in headers if HEADER_NAME_RE.match(header)]
+        self.max_size = max_size
+
+    @classmethod
+    def from_entry_data(cls, data: Mapping[str, Any]) -> MessageRules:
+        """Create the rules from the config entry data."""
+        return cls(
+            data.get(CONF_FILTER_SENDERS, []),
+            data.get(CONF_FILTER_SUBJECT),
+            data.get(CONF_FILTER_HEADERS, []),
+            data.get(CONF_FILTER_MAX_SIZE, 0),
+        )
+
+    @property
+    def active(self) -> bool:
+        """Return if any rule is configured."""
+        return bool(
+            self.senders or self.subject_re or self.headers or self.max_size
+        )
+
+    @property
+    def header_fields(self) -> list[str]:
+        """Return the header fields needed to evaluate the rules."""
+        return list(dict.fromkeys(["From", "Subject", "Message-ID", *self.headers]))
+
+    def _match_sender(self, sender: str) -> bool:
+        """Return if the sender matches a sender rule."""
+        sender = sender.lower()
+        domain = sender.rpartition("@")[2]
+        for rule in self.senders:
+            if rule.startswith("@"):
+                rule = rule[1:]
+            elif "@" in rule:
+                if sender == rule:
+                    return True
+                continue
+            if domain == rule or domain.endswith(f".{rule}"):
+                return True
+        return False
+
+    def match(
+        self, sender: str, subject: str, header_names: set[str], size: int | None
+    ) -> bool:
+        """Return if a message matches all configured rules."""
+        if self.max_size and size is not None and size > self.max_size:
+            return False
+        if self.senders and not self._match_sender(sender):
+            return False
+        if self.subject_re is not None and not self.subject_re.search(subject):
+            return False
+        lower_names = {name.lower() for name in header_names}
+        return all(header.lower() in lower_names for header in self.headers)
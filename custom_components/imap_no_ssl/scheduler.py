@@ -0,0 +1,130 @@
+"""Scheduling of the IMAP sessions of a config entry."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import heapq
+import itertools
+import time
+from typing import Any
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BULK: "bulk",
+}
+
+DEFAULT_MAX_SESSIONS = 2
+MAX_SESSIONS_LIMIT = 10
+DEFAULT_QUEUE_TIMEOUT = 60
+
+
+class SchedulerQueueTimeout(Exception):
+    """Error to indicate work waited too long for a session."""
+
+
+class SessionScheduler:
+    """Limit the number of concurrent IMAP sessions of a config entry.
+
+    Work that cannot start immediately is queued and started in priority
+    order as sessions finish. Work with the same priority starts in the
+    order it was queued.
+
+    The sessions are connections for service calls. The long-lived
+    connections of the entry, for the sync and IDLE and for processing
+    pushed messages, are not scheduled and come on top of them.
+    """
+
+    def __init__(self, max_sessions: int, queue_timeout: float) -> None:
+        """Initialize the scheduler."""
+        self.max_sessions = max_sessions
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._queue: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = itertools.count()
+        self._max_queue_depth = 0
+        self._started = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self._timeouts = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self._wait_time = dict.fromkeys(PRIORITY_NAMES.values(), 0.0)
+
+    def _start_next(self) -> None:
+        """Start queued work while sessions are available."""
+        while self._queue and self._active < self.max_sessions:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    async def _acquire(self, priority: int) -> None:
+        """Wait until a session is available."""
+        name = PRIORITY_NAMES[priority]
+        if self._active < self.max_sessions and not self._queue:
+            self._active += 1
+            self._started[name] += 1
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), waiter))
+        self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except (TimeoutError, asyncio.CancelledError) as err:
+            if waiter.done() and not waiter.cancelled():
+                # The session was handed over just before the cancellation
+                self._release()
+            if isinstance(err, TimeoutError):
+                self._timeouts[name] += 1
+                raise SchedulerQueueTimeout(
+                    f"Waited more than {self.queue_timeout} s for an IMAP session"
+                ) from err
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            self._queue = [item for item in self._queue if not item[2].done()]
+            heapq.heapify(self._queue)
+        self._started[name] += 1
+        self._wait_time[name] += time.monotonic() - start
+
+    def _release(self) -> None:
+        """Release a session and start the next queued work."""
+        self._active -= 1
+        self._start_next()
+
+    @asynccontextmanager
+    async def session(self, priority: int) -> AsyncIterator[None]:
+        """Run the work of the context in a scheduled session."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @property
+    def metrics(self) -> dict[str, Any]:
+        """Return the scheduler metrics."""
+        return {
+            "max_sessions": self.max_sessions,
+            "active_sessions": self._active,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self._max_queue_depth,
+            "queued": {
+                name: sum(
+                    1
+                    for priority, _, _ in self._queue
+                    if PRIORITY_NAMES[priority] == name
+                )
+                for name in PRIORITY_NAMES.values()
+            },
+            "started": dict(self._started),
+            "timeouts": dict(self._timeouts),
+            "average_wait": {
+                name: round(self._wait_time[name] / count, 3) if count else 0.0
+                for name, count in self._started.items()
+            },
+        }
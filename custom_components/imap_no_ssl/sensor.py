@@ -2,20 +2,46 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
+
 from homeassistant.components.sensor import (
+    SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_USERNAME
+from homeassistant.const import (
+    CONF_USERNAME,
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfInformation,
+)
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import slugify
 
 from . import ImapPollingDataUpdateCoordinator, ImapPushDataUpdateCoordinator
-from .const import DOMAIN
+from .const import CONF_ENABLE_STATUS_SENSORS, CONF_EXTRA_SEARCHES, DOMAIN
+from .coordinator import parse_extra_searches
+
+
+@dataclass(frozen=True, kw_only=True)
+class ImapStatusSensorEntityDescription(SensorEntityDescription):
+    """Describes an IMAP folder status sensor."""
+
+    value_fn: Callable[[dict[str, int | None]], int | float | None]
+
+
+def _quota_percentage(status_data: dict[str, int | None]) -> float | None:
+    """Return the used share of the storage quota."""
+    if not (limit := status_data.get("quota_limit")):
+        return None
+    return round((status_data.get("quota_usage") or 0) * 100 / limit, 1)
+
 
 IMAP_MAIL_COUNT_DESCRIPTION = SensorEntityDescription(
     key="imap_mail_count",
@@ -25,6 +51,76 @@ IMAP_MAIL_COUNT_DESCRIPTION = SensorEntityDescription(
     name=None,
 )
 
+IMAP_SEARCH_COUNT_DESCRIPTION = SensorEntityDescription(
+    key="search_count",
+    state_class=SensorStateClass.MEASUREMENT,
+    suggested_display_precision=0,
+)
+
+IMAP_STATUS_DESCRIPTIONS: tuple[ImapStatusSensorEntityDescription, ...] = (
+    ImapStatusSensorEntityDescription(
+        key="messages",
+        translation_key="messages",
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda data: data.get("messages"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="unseen",
+        translation_key="unseen",
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda data: data.get("unseen"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="recent",
+        translation_key="recent",
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        value_fn=lambda data: data.get("recent"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="uidnext",
+        translation_key="uidnext",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+        value_fn=lambda data: data.get("uidnext"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="size",
+        translation_key="size",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEBIBYTES,
+        value_fn=lambda data: data.get("size"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="quota_usage",
+        translation_key="quota_usage",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.KIBIBYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEBIBYTES,
+        value_fn=lambda data: data.get("quota_usage"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="quota_limit",
+        translation_key="quota_limit",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.KIBIBYTES,
+        suggested_unit_of_measurement=UnitOfInformation.MEBIBYTES,
+        value_fn=lambda data: data.get("quota_limit"),
+    ),
+    ImapStatusSensorEntityDescription(
+        key="quota_percentage",
+        translation_key="quota_percentage",
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=PERCENTAGE,
+        value_fn=_quota_percentage,
+    ),
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
@@ -34,7 +130,17 @@ async def async_setup_entry(
     coordinator: ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator = (
         hass.data[DOMAIN][entry.entry_id]
     )
-    async_add_entities([ImapSensor(coordinator, IMAP_MAIL_COUNT_DESCRIPTION)])
+    entities: list[ImapSensor] = [ImapSensor(coordinator, IMAP_MAIL_COUNT_DESCRIPTION)]
+    if entry.data.get(CONF_ENABLE_STATUS_SENSORS, False):
+        entities.extend(
+            ImapStatusSensor(coordinator, description)
+            for description in IMAP_STATUS_DESCRIPTIONS
+        )
+    entities.extend(
+        ImapSearchSensor(coordinator, IMAP_SEARCH_COUNT_DESCRIPTION, name)
+        for name in parse_extra_searches(entry.data.get(CONF_EXTRA_SEARCHES, [])) or {}
+    )
+    async_add_entities(entities)
 
 
 class ImapSensor(
@@ -60,7 +166,65 @@ class ImapSensor(
             entry_type=DeviceEntryType.SERVICE,
         )
 
+    @property
+    def available(self) -> bool:
+        """Return if the first sync with the server has completed."""
+        return super().available and self.coordinator.data is not None
+
     @property
     def native_value(self) -> int | None:
         """Return the number of emails found."""
         return self.coordinator.data
+
+
+class ImapStatusSensor(ImapSensor):
+    """Representation of an IMAP folder status sensor."""
+
+    entity_description: ImapStatusSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator,
+        description: ImapStatusSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, description)
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}_{description.key}"
+
+    @property
+    def available(self) -> bool:
+        """Return if the server reported the value."""
+        return super().available and self.native_value is not None
+
+    @property
+    def native_value(self) -> int | float | None:
+        """Return the value from the last folder status."""
+        return self.entity_description.value_fn(self.coordinator.status_data)
+
+
+class ImapSearchSensor(ImapSensor):
+    """Representation of a sensor for a named search."""
+
+    def __init__(
+        self,
+        coordinator: ImapPushDataUpdateCoordinator | ImapPollingDataUpdateCoordinator,
+        description: SensorEntityDescription,
+        search_name: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, description)
+        self._search_name = search_name
+        self._attr_name = search_name
+        self._attr_unique_id = (
+            f"{coordinator.config_entry.entry_id}_search_{slugify(search_name)}"
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if the last search succeeded."""
+        return super().available and self.native_value is not None
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the number of emails found by the search."""
+        return self.coordinator.search_counts.get(self._search_name)
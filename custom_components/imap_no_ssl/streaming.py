@@ -0,0 +1,183 @@
+"""Parse a fetched message while it is received.
+
+The streaming command replaces the literal handling of the aioimaplib
+`Command`, and relies on its private `_expected_size`, `_resp_lines` and
+`_reset_timer` members of the pinned aioimaplib 1.0.1. `STREAMING_SUPPORTED`
+is `False` when an aioimaplib release no longer has them, messages are then
+fetched without streaming.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from email.feedparser import BytesFeedParser
+from email.message import Message
+import logging
+import re
+
+from aioimaplib import IMAP4, Command, FetchCommand
+
+_LOGGER = logging.getLogger(__name__)
+
+BODY_LITERAL_RE = re.compile(rb"BODY\[\] \{\d+\}$")
+HEADER_END_RE = re.compile(rb"\r?\n\r?\n")
+
+
+def _has_private_members() -> bool:
+    """Return if the aioimaplib command has the members the streaming uses."""
+    attributes = Command.__init__.__code__.co_names
+    return (
+        "_expected_size" in attributes
+        and "_resp_lines" in attributes
+        and callable(getattr(Command, "_reset_timer", None))
+    )
+
+
+STREAMING_SUPPORTED = _has_private_members()
+if not STREAMING_SUPPORTED:
+    _LOGGER.warning(
+        "The installed aioimaplib is not supported for streaming, "
+        "messages are parsed after they are received"
+    )
+
+
+class StreamingFetchCommand(FetchCommand):
+    """UID FETCH of a whole message that feeds the message to a parser.
+
+    The message literal is not collected, every received chunk is passed on
+    to a `BytesFeedParser`. Once the headers and `budget` bytes of the body
+    are parsed, the message is complete and the rest of the literal is
+    discarded. A budget of `None` parses the whole message.
+    """
+
+    def __init__(
+        self,
+        tag: str,
+        message_uid: str,
+        budget: int | None,
+        *,
+        loop: asyncio.AbstractEventLoop,
+        timeout: float | None = None,
+        profile: Callable[[], AbstractContextManager[None]] = nullcontext,
+    ) -> None:
+        """Initialize the command."""
+        super().__init__(
+            tag, message_uid, "BODY.PEEK[]", prefix="UID", loop=loop, timeout=timeout
+        )
+        self.budget = budget
+        self._profile = profile
+        self.message: asyncio.Future[Message] = loop.create_future()
+        self._parser = BytesFeedParser()
+        self._streaming = False
+        self._received = 0
+        self._parsed = 0
+        self._header_end: int | None = None
+        self._tail = b""
+
+    def begin_literal_data(self, expected_size: int, literal_data: bytes = b"") -> bytes:
+        """Start receiving a literal, streaming it if it is the message."""
+        if self.message.done() or not (
+            self._resp_lines and BODY_LITERAL_RE.search(self._resp_lines[-1])
+        ):
+            return super().begin_literal_data(expected_size, literal_data)
+        self._streaming = True
+        self._expected_size = expected_size
+        self._received = 0
+        return self.append_literal_data(literal_data)
+
+    def wait_literal_data(self) -> bool:
+        """Return if more literal data is expected."""
+        if self._streaming:
+            return self._received != self._expected_size
+        return super().wait_literal_data()
+
+    def append_literal_data(self, data: bytes) -> bytes:
+        """Parse received literal data, return the data after the literal."""
+        if not self._streaming:
+            return super().append_literal_data(data)
+        chunk = data[: self._expected_size - self._received]
+        self._received += len(chunk)
+        self._feed(chunk)
+        if self._received == self._expected_size:
+            self._streaming = False
+            self._expected_size = 0
+            # Keep the place of the literal in the response lines
+            self.append_to_resp(b"")
+            self._finish()
+        self._reset_timer()
+        return data[len(chunk) :]
+
+    def _feed(self, data: bytes) -> None:
+        """Pass data to the parser until the budget is used."""
+        if self.message.done() or not data:
+            return
+        if self._header_end is None:
+            window = self._tail + data
+            if (match := HEADER_END_RE.search(window)) is not None:
+                self._header_end = self._parsed - len(self._tail) + match.end()
+            self._tail = window[-3:]
+        if self._header_end is not None and self.budget is not None:
+            data = data[: max(self._header_end + self.budget - self._parsed, 0)]
+        with self._profile():
+            self._parser.feed(data)
+        self._parsed += len(data)
+        if (
+            self._header_end is not None
+            and self.budget is not None
+            and self._parsed >= self._header_end + self.budget
+        ):
+            self._finish()
+
+    def _finish(self) -> None:
+        """Complete the message."""
+        if not self.message.done():
+            with self._profile():
+                message = self._parser.close()
+            self.message.set_result(message)
+
+
+def _log_drain_error(task: asyncio.Task) -> None:
+    """Log an error while the rest of a message was received."""
+    if not task.cancelled() and (exc := task.exception()) is not None:
+        _LOGGER.debug("Error after the message was parsed: %s", exc)
+
+
+async def async_fetch_message_streaming(
+    client: IMAP4,
+    message_uid: str,
+    budget: int | None,
+    profile: Callable[[], AbstractContextManager[None]] = nullcontext,
+) -> Message | None:
+    """Fetch and parse a message, return as soon as the budget is parsed.
+
+    The connection finishes receiving the message in the background, later
+    commands wait for it. `profile` is entered around the synchronous
+    parsing of each received chunk.
+    """
+    protocol = client.protocol
+    command = StreamingFetchCommand(
+        protocol.new_tag(),
+        message_uid,
+        budget,
+        loop=protocol.loop,
+        timeout=client.timeout,
+        profile=profile,
+    )
+    task = asyncio.ensure_future(protocol.execute(command))
+    try:
+        await asyncio.wait(
+            (command.message, task), return_when=asyncio.FIRST_COMPLETED
+        )
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if command.message.done():
+        task.add_done_callback(_log_drain_error)
+        return command.message.result()
+    # The command completed without a message
+    command.message.cancel()
+    response = task.result()
+    _LOGGER.debug("Fetching message %s failed: %s", message_uid, response.lines)
+    return None
@@ -0,0 +1,212 @@
+"""Bounded text extraction from email message parts."""
+
+from __future__ import annotations
+
+import binascii
+import codecs
+from collections.abc import Iterator
+from email.message import Message
+from html.parser import HTMLParser
+import re
+
+# Size of the encoded chunks that are decoded at a time
+DECODE_CHUNK_SIZE = 8192
+
+# Elements whose content is not shown to the reader
+SKIPPED_ELEMENTS = {"head", "script", "style", "template", "title"}
+
+# Elements that start a new line in the rendered text
+BLOCK_ELEMENTS = {
+    "address",
+    "article",
+    "blockquote",
+    "br",
+    "div",
+    "dl",
+    "dt",
+    "dd",
+    "footer",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hr",
+    "li",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "tr",
+    "ul",
+}
+
+WHITESPACE_RE = re.compile(r"\s+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+NON_BASE64_RE = re.compile(rb"[^A-Za-z0-9+/=]")
+
+
+class HtmlTextExtractor(HTMLParser):
+    """Convert HTML to plain text until a size limit is reached.
+
+    The parser can be fed in chunks. Once `done` is set, the text holds at
+    least `limit` characters and no more input is needed.
+    """
+
+    def __init__(self, limit: int | None = None) -> None:
+        """Initialize the extractor."""
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.done = False
+        self._parts: list[str] = []
+        self._length = 0
+        self._skip_depth = 0
+        self._at_line_start = True
+
+    def _append(self, text: str) -> None:
+        """Add text to the output and check the limit."""
+        self._parts.append(text)
+        self._length += len(text)
+        if self.limit is not None and self._length >= self.limit:
+            self.done = True
+
+    def _newline(self) -> None:
+        """Start a new line unless the output is at the start of a line."""
+        if not self._at_line_start:
+            self._append("\n")
+            self._at_line_start = True
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        """Handle an opening tag."""
+        if tag in SKIPPED_ELEMENTS:
+            self._skip_depth += 1
+        elif tag in BLOCK_ELEMENTS:
+            self._newline()
+
+    def handle_startendtag(
+        self, tag: str, attrs: list[tuple[str, str | None]]
+    ) -> None:
+        """Handle a self closing tag."""
+        if tag in BLOCK_ELEMENTS:
+            self._newline()
+
+    def handle_endtag(self, tag: str) -> None:
+        """Handle a closing tag."""
+        if tag in SKIPPED_ELEMENTS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in BLOCK_ELEMENTS:
+            self._newline()
+
+    def handle_data(self, data: str) -> None:
+        """Handle text content."""
+        if self._skip_depth or self.done:
+            return
+        text = WHITESPACE_RE.sub(" ", data)
+        if self._at_line_start:
+            text = text.lstrip()
+        if text:
+            self._append(text)
+            self._at_line_start = False
+
+    @property
+    def text(self) -> str:
+        """Return the extracted text."""
+        text = "".join(self._parts)
+        text = "\n".join(line.strip() for line in text.split("\n"))
+        text = BLANK_LINES_RE.sub("\n\n", text).strip()
+        return text[: self.limit] if self.limit is not None else text
+
+
+def _iter_raw_payload(part: Message) -> Iterator[bytes]:
+    """Yield the undecoded payload of a part in chunks."""
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return
+    try:
+        raw = payload.encode("ascii", "surrogateescape")
+    except UnicodeEncodeError:
+        # The payload was set from a str with non ascii characters
+        raw = payload.encode("utf-8")
+    for start in range(0, len(raw), DECODE_CHUNK_SIZE):
+        yield raw[start : start + DECODE_CHUNK_SIZE]
+
+
+def _iter_quoted_printable(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Decode quoted-printable content chunk by chunk."""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        # Only decode complete lines so escapes are never split
+        end = pending.rfind(b"\n") + 1
+        if end:
+            yield binascii.a2b_qp(pending[:end])
+            pending = pending[end:]
+    if pending:
+        yield binascii.a2b_qp(pending)
+
+
+def _iter_base64(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Decode base64 content chunk by chunk."""
+    pending = b""
+    for chunk in chunks:
+        pending += NON_BASE64_RE.sub(b"", chunk)
+        end = len(pending) - len(pending) % 4
+        if end:
+            try:
+                yield binascii.a2b_base64(pending[:end])
+            except binascii.Error:
+                return
+            pending = pending[end:]
+    if pending:
+        try:
+            yield binascii.a2b_base64(pending + b"=" * (-len(pending) % 4))
+        except binascii.Error:
+            return
+
+
+def iter_decoded_text(part: Message) -> Iterator[str]:
+    """Yield the text of a part in decoded chunks."""
+    chunks = _iter_raw_payload(part)
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+    if encoding == "quoted-printable":
+        chunks = _iter_quoted_printable(chunks)
+    elif encoding == "base64":
+        chunks = _iter_base64(chunks)
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        if text := decoder.decode(chunk):
+            yield text
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+def extract_text(part: Message, limit: int | None = None) -> str:
+    """Decode a text part, stopping once `limit` characters are available."""
+    parts: list[str] = []
+    length = 0
+    for text in iter_decoded_text(part):
+        parts.append(text)
+        length += len(text)
+        if limit is not None and length >= limit:
+            break
+    text = "".join(parts)
+    return text[:limit] if limit is not None else text
+
+
+def extract_html_text(part: Message, limit: int | None = None) -> str:
+    """Convert an HTML part to text, stopping once `limit` characters are available."""
+    extractor = HtmlTextExtractor(limit)
+    for text in iter_decoded_text(part):
+        extractor.feed(text)
+        if extractor.done:
+            break
+    else:
+        extractor.close()
+    return extractor.text
@@ -0,0 +1,146 @@
+"""Cached SSL contexts with TLS session resumption."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import suppress
+from functools import partial
+from os import environ
+import ssl
+from typing import Any
+
+from aioimaplib import IMAP4
+import certifi
+
+from homeassistant.util.ssl import SSL_CIPHER_LISTS, SSLCipherList
+
+
+class TlsConnectionStats:
+    """Connection timings and session reuse of a server."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.connections = 0
+        self.resumed = 0
+        self.last_connect_time: float | None = None
+        self._total_connect_time = 0.0
+
+    def add(self, connect_time: float, resumed: bool) -> None:
+        """Add a connection."""
+        self.connections += 1
+        self.resumed += resumed
+        self.last_connect_time = connect_time
+        self._total_connect_time += connect_time
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics."""
+        return {
+            "connections": self.connections,
+            "resumed_sessions": self.resumed,
+            "last_connect_time": (
+                None
+                if self.last_connect_time is None
+                else round(self.last_connect_time, 3)
+            ),
+            "average_connect_time": (
+                round(self._total_connect_time / self.connections, 3)
+                if self.connections
+                else None
+            ),
+        }
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """SSL context that resumes the last TLS session with its server.
+
+    asyncio creates the TLS connection through `wrap_bio`, which is where
+    the stored session is passed on. A context must only be used for a
+    single server.
+    """
+
+    session: ssl.SSLSession | None = None
+    stats: TlsConnectionStats
+
+    def wrap_bio(  # type: ignore[override]
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: str | bytes | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> ssl.SSLObject:
+        """Wrap the BIO objects, resuming the stored session."""
+        if session is None and not server_side:
+            session = self.session
+        return super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+
+
+_CONTEXTS: dict[tuple[str, int, bool, str], ResumableSSLContext] = {}
+
+
+def _create_ssl_context(
+    verify_ssl: bool, ssl_cipher_list: SSLCipherList
+) -> ResumableSSLContext:
+    """Create an SSL context like the shared Home Assistant client contexts."""
+    context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.stats = TlsConnectionStats()
+    if verify_ssl:
+        context.load_verify_locations(
+            cafile=environ.get("REQUESTS_CA_BUNDLE", certifi.where())
+        )
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        context.set_default_verify_paths()
+    with suppress(AttributeError):
+        context.options |= ssl.OP_NO_COMPRESSION
+    if ssl_cipher_list != SSLCipherList.PYTHON_DEFAULT:
+        context.set_ciphers(SSL_CIPHER_LISTS[ssl_cipher_list])
+    return context
+
+
+def _context_key(
+    server: str, port: int, verify_ssl: bool, ssl_cipher_list: str
+) -> tuple[str, int, bool, str]:
+    """Return the cache key of a server."""
+    return (server.lower(), port, verify_ssl, ssl_cipher_list)
+
+
+async def async_get_ssl_context(
+    server: str, port: int, verify_ssl: bool, ssl_cipher_list: str
+) -> ResumableSSLContext:
+    """Return the cached SSL context of a server, creating it if needed."""
+    key = _context_key(server, port, verify_ssl, ssl_cipher_list)
+    if (context := _CONTEXTS.get(key)) is None:
+        # Loading the certificates blocks
+        context = await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(_create_ssl_context, verify_ssl, SSLCipherList(ssl_cipher_list)),
+        )
+        context = _CONTEXTS.setdefault(key, context)
+    return context
+
+
+def record_tls_session(
+    client: IMAP4, context: ResumableSSLContext, connect_time: float
+) -> None:
+    """Store the TLS session of a connection for the next connection."""
+    ssl_object: ssl.SSLObject | None = client.protocol.transport.get_extra_info(
+        "ssl_object"
+    )
+    if ssl_object is None:
+        return
+    if ssl_object.session is not None:
+        context.session = ssl_object.session
+    context.stats.add(connect_time, ssl_object.session_reused)
+
+
+def get_tls_stats(
+    server: str, port: int, verify_ssl: bool, ssl_cipher_list: str
+) -> dict[str, Any] | None:
+    """Return the TLS statistics of a server."""
+    context = _CONTEXTS.get(_context_key(server, port, verify_ssl, ssl_cipher_list))
+    return None if context is None else context.stats.as_dict
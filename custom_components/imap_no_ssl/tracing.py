@@ -0,0 +1,105 @@
+"""Opt-in tracing and profiling of the message processing."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+import cProfile
+from datetime import UTC, datetime
+import io
+import pstats
+import time
+from typing import Any
+
+TRACE_BUFFER_SIZE = 200
+PROFILE_STATS_LINES = 30
+
+
+class Tracer:
+    """Record the duration of the processing stages of messages.
+
+    The last `TRACE_BUFFER_SIZE` spans are kept. Spans can be nested, the
+    duration of a fetch includes the parse of the fetched message.
+    Profiling only covers the synchronous parse and render stages, because
+    a profiler running across an await would profile other tasks too.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """Initialize the tracer."""
+        self.enabled = enabled
+        self.profiling = False
+        self._spans: deque[dict[str, Any]] = deque(maxlen=TRACE_BUFFER_SIZE)
+        self._profile: cProfile.Profile | None = None
+        self._profiled = 0
+
+    @contextmanager
+    def span(self, name: str, message_uid: str | None = None) -> Iterator[None]:
+        """Record the duration of the work of the context."""
+        if not self.enabled:
+            yield
+            return
+        started = datetime.now(UTC)
+        start = time.perf_counter()
+        error: str | None = None
+        try:
+            yield
+        except BaseException as err:
+            error = type(err).__name__
+            raise
+        finally:
+            self._spans.append(
+                {
+                    "name": name,
+                    "uid": message_uid,
+                    "start": started.isoformat(),
+                    "duration": round(time.perf_counter() - start, 6),
+                    "error": error,
+                }
+            )
+
+    def set_profiling(self, enabled: bool) -> None:
+        """Turn profiling on with new statistics, or off keeping the statistics."""
+        if enabled and not self.profiling:
+            self._profile = cProfile.Profile()
+            self._profiled = 0
+        self.profiling = enabled
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        """Profile the synchronous work of the context if profiling is on."""
+        if not self.profiling or self._profile is None:
+            yield
+            return
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Another profiler is active in this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            self._profiled += 1
+
+    @property
+    def profile_stats(self) -> list[str] | None:
+        """Return the functions with the highest cumulative time."""
+        if self._profile is None or not self._profiled:
+            return None
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_STATS_LINES)
+        return [line for line in stream.getvalue().splitlines() if line.strip()]
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        """Return the recorded spans and the profile statistics."""
+        return {
+            "enabled": self.enabled,
+            "profiling": self.profiling,
+            "spans": list(self._spans),
+            "profiled_stages": self._profiled,
+            "profile": self.profile_stats,
+        }